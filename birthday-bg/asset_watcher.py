@@ -0,0 +1,192 @@
+"""
+Watch the encrypted assets and tell subscribers which caches became stale
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+from contextlib import contextmanager
+from crypto_utils import get_encrypted_path, get_encrypted_file_signature
+
+# Cached things that depend on each encrypted input
+DEPENDENCIES = {
+    'data.csv': ('roster_index', 'rendered_outputs'),
+    'config.yaml': ('render_plan', 'font_cache', 'rendered_outputs'),
+    'bgs/template.png': ('decoded_template', 'template_pyramid', 'rendered_outputs'),
+    'bgs/default.png': ('default_cache', 'rendered_outputs'),
+}
+# Caches that depend on the other templates picked by the roster or config
+TEMPLATE_DEPENDENCIES = DEPENDENCIES['bgs/template.png']
+
+# Seconds between checks when inotify isn't available
+POLL_INTERVAL = 1.0
+
+# inotify events that can replace the content of a file
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def get_invalidated(paths):
+    """Get names of the caches that depend on the given original paths
+
+    Paths other than the fixed inputs are templates (see AssetWatcher.watch).
+    """
+    invalidated = set()
+    for path in paths:
+        invalidated.update(DEPENDENCIES.get(path, TEMPLATE_DEPENDENCIES))
+    return invalidated
+
+
+class Inotify:
+    """Minimal inotify wrapper (Linux) used to wake the watcher on changes"""
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        for directory in directories:
+            if libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout):
+        """Wait for events, return names of the changed files"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        names = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class AssetWatcher:
+    """Watch encrypted assets and notify subscribers of stale caches
+
+    Subscribers are called from the watcher thread with (changed original
+    paths, invalidated cache names). Changes are detected by comparing
+    size/mtime; inotify (Linux) only wakes the check early, other platforms
+    poll every POLL_INTERVAL seconds.
+    """
+
+    def __init__(self, basepath="", paths=None, interval=POLL_INTERVAL):
+        self.basepath = basepath
+        self.paths = list(paths or DEPENDENCIES)
+        self.interval = interval
+        self.subscribers = []
+        self.lock = threading.RLock()
+        self.signatures = {path: get_encrypted_file_signature(path, basepath) for path in self.paths}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def subscribe(self, callback):
+        """Register callback(changed_paths, invalidated)"""
+        self.subscribers.append(callback)
+
+    def watch(self, *paths):
+        """Also watch these original paths (templates named by the roster or config)
+
+        Paths in a directory the watcher thread didn't start with are only
+        seen by the periodic check.
+        """
+        with self.lock:
+            for path in paths:
+                if path not in self.paths:
+                    self.paths.append(path)
+                    self.signatures[path] = get_encrypted_file_signature(path, self.basepath)
+
+    @contextmanager
+    def suppress(self, *paths):
+        """Write paths in this process without the change being reported back
+
+        The watcher lock is held during the write and the new signatures are
+        recorded before it is released, so check() can't see the write half
+        done. Keep the block to the write itself: checks wait for it.
+        """
+        with self.lock:
+            try:
+                yield
+            finally:
+                for path in paths:
+                    self.signatures[path] = get_encrypted_file_signature(path, self.basepath)
+
+    def check(self):
+        """Compare signatures once and notify subscribers, return the changed paths"""
+        changed = set()
+        with self.lock:
+            for path in self.paths:
+                signature = get_encrypted_file_signature(path, self.basepath)
+                if signature != self.signatures[path]:
+                    self.signatures[path] = signature
+                    changed.add(path)
+        if changed:
+            invalidated = get_invalidated(changed)
+            for callback in self.subscribers:
+                try:
+                    callback(changed, invalidated)
+                except Exception as e:
+                    print(f"Error in asset watcher subscriber: {e}")
+        return changed
+
+    def start(self):
+        """Start watching in a daemon thread"""
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        inotify = None
+        if sys.platform.startswith("linux"):
+            directories = {os.path.dirname(os.path.join(self.basepath, get_encrypted_path(path))) or "."
+                           for path in self.paths}
+            try:
+                inotify = Inotify([d for d in directories if os.path.isdir(d)])
+            except OSError as e:
+                print(f"inotify unavailable, polling instead: {e}")
+
+        try:
+            while not self.stop_event.is_set():
+                if inotify is not None:
+                    # Still check periodically in case a directory was created later
+                    names = inotify.wait(self.interval)
+                    with self.lock:
+                        encrypted_names = {os.path.basename(get_encrypted_path(path))
+                                           for path in self.paths}
+                    if names and not names & encrypted_names:
+                        continue
+                else:
+                    self.stop_event.wait(self.interval)
+                self.check()
+        finally:
+            if inotify is not None:
+                inotify.close()
@@ -0,0 +1,368 @@
+"""
+Benchmarks for the birthday background pipeline
+
+Usage: python benchmark.py [name ...]
+"""
+
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from PIL import Image, ImageDraw, ImageFont
+
+import crypto_utils
+import main
+
+
+def make_test_image(width=3840, height=2160):
+    """Create a 4K test image with gradients and text-like detail"""
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for i in range(0, width, 97):
+        draw.line((i, 0, width - i, height), fill=(i % 255, 80, 200), width=3)
+    return image
+
+
+def time_call(func, repeat=5):
+    """Return best wall time of func in milliseconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_output():
+    """Compare rendered wallpaper encoders: encode + write + decode by the wallpaper backend"""
+    image = make_test_image()
+    settings = [
+        {'format': 'bmp'},
+        {'format': 'png', 'png_compress_level': 1},
+        {'format': 'png', 'png_compress_level': 6},
+        {'format': 'jpeg', 'jpeg_quality': 90},
+        {'format': 'jpeg', 'jpeg_quality': 95},
+    ]
+
+    print(f"Output encoders ({image.size[0]}x{image.size[1]}):")
+    with tempfile.TemporaryDirectory() as tmp:
+        for output in settings:
+            config = {'output': output}
+            path = main.get_output_path(config, tmp)
+
+            def save():
+                main.save_rendered_image(image, path, config)
+
+            def load():
+                with Image.open(path) as loaded:
+                    loaded.load()
+
+            save_ms = time_call(save)
+            load_ms = time_call(load)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            label = ', '.join(f"{k}={v}" for k, v in output.items())
+            print(f"  {label:<40} save {save_ms:8.1f} ms  load {load_ms:8.1f} ms  "
+                  f"total {save_ms + load_ms:8.1f} ms  {size_mb:6.1f} MB")
+
+
+def bench_ciphers(size_mb=16):
+    """Compare encrypt/decrypt throughput and random access across ciphers"""
+    data = os.urandom(size_mb * 1024 * 1024)
+
+    print(f"Ciphers ({size_mb} MB):")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.dat')
+        for name in crypto_utils.CIPHERS:
+            encrypted = crypto_utils.encrypt_bytes(data, name)
+            with open(path, 'wb') as f:
+                f.write(encrypted)
+
+            encrypt_ms = time_call(lambda: crypto_utils.encrypt_bytes(data, name), repeat=3)
+            decrypt_ms = time_call(lambda: crypto_utils.decrypt_bytes(encrypted), repeat=3)
+            range_ms = time_call(lambda: crypto_utils.decrypt_range(path, len(data) // 2 + 13, 4096))
+            print(f"  {name:<14} encrypt {size_mb / encrypt_ms * 1000:8.1f} MB/s  "
+                  f"decrypt {size_mb / decrypt_ms * 1000:8.1f} MB/s  "
+                  f"4 KiB range {range_ms:6.3f} ms")
+
+
+def make_roster_csv(rows):
+    """Create a CSV roster with the same columns as data.csv"""
+    rng = random.Random(rows)
+    lines = ['name,birthday,other_info,greetings']
+    for _ in range(rows):
+        name = ''.join(rng.choices(string.ascii_letters, k=rng.randint(4, 12)))
+        birthday = f"{rng.randint(1, 12)}.{rng.randint(1, 28)}"
+        other_info = rng.choice(['loves cats', 'loves dogs', 'plays chess', 'likes music'])
+        lines.append(f"{name},{birthday},{other_info},Happy Birthday!")
+    return '\n'.join(lines) + '\n'
+
+
+def bench_compression(row_counts=(10000, 100000, 1000000)):
+    """Compare encrypted roster size and load latency across codecs"""
+    print("Roster compression:")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in row_counts:
+            content = make_roster_csv(rows)
+            plain_mb = len(content.encode('utf-8')) / 1024 / 1024
+            for codec_name in crypto_utils.CODECS:
+                path = os.path.join(tmp, 'data.csv')
+
+                def save():
+                    with crypto_utils.EncryptedFileWriter('data.csv', tmp, codec_name=codec_name) as writer:
+                        writer.write(content)
+
+                repeat = 1 if rows >= 1000000 else 3
+                save_ms = time_call(save, repeat=repeat)
+                load_ms = time_call(lambda: crypto_utils.load_encrypted_text_file('data.csv', tmp),
+                                    repeat=repeat)
+                size_mb = os.path.getsize(os.path.join(tmp, crypto_utils.get_encrypted_path('data.csv'))) / 1024 / 1024
+                print(f"  {rows:>8} rows {codec_name:<5} {size_mb:7.2f} MB "
+                      f"({size_mb / plain_mb:5.1%})  save {save_ms:9.1f} ms  load {load_ms:8.1f} ms")
+
+
+def make_test_basepath(directory, birthday_today=False):
+    """Create a basepath with encrypted copies of the repo's data, config and images"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, 'data.csv'), encoding='utf-8') as f:
+        data = f.read()
+    if birthday_today:
+        today = datetime.now()
+        data = data.rstrip('\n') + f"\nToday, {today.month}.{today.day}, benchmark, Happy Birthday!\n"
+    with open(os.path.join(here, 'config.yaml'), encoding='utf-8') as f:
+        config = f.read()
+    with open(os.path.join(here, 'bgs', 'default.png'), 'rb') as f:
+        image = f.read()
+
+    crypto_utils.save_encrypted_text_file('data.csv', data, directory)
+    crypto_utils.save_encrypted_text_file('config.yaml', config, directory)
+    crypto_utils.save_encrypted_binary_file('bgs/template.png', image, directory)
+    crypto_utils.save_encrypted_binary_file('bgs/default.png', image, directory)
+
+
+def bench_coldstart(runs=10):
+    """Measure process start-to-exit time of main.py (and the frozen exe if given)
+
+    Set BIRTHDAY_BG_EXE to the path of a frozen build to time it as well. The
+    frozen build must be able to run main() (the D:/099/1009.txt guard).
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    script = [sys.executable, '-c', f"import sys; sys.path.insert(0, {here!r}); import main; main.main()"]
+    commands = [('script', script)]
+    if os.environ.get('BIRTHDAY_BG_EXE'):
+        commands.append(('frozen', [os.environ['BIRTHDAY_BG_EXE']]))
+
+    print(f"Cold start (best/median of {runs} runs):")
+    for birthday_today in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            make_test_basepath(tmp, birthday_today)
+            env = dict(os.environ, BIRTHDAY_BG_BASEPATH=tmp + os.sep,
+                       BIRTHDAY_BG_WALLPAPER_BACKEND='file')
+            state_path = os.path.join(tmp, 'bgs', 'wallpaper_state.json')
+            for label, command in commands:
+                for up_to_date in (False, True):
+                    times = []
+                    for _ in range(runs):
+                        if not up_to_date and os.path.exists(state_path):
+                            os.remove(state_path)
+                        start = time.perf_counter()
+                        subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=False)
+                        times.append((time.perf_counter() - start) * 1000)
+                    times.sort()
+                    path = 'birthday' if birthday_today else 'default'
+                    run = 'up to date' if up_to_date else 'full run'
+                    print(f"  {label:<7} {path:<9} {run:<11} best {times[0]:7.1f} ms  "
+                          f"median {times[len(times) // 2]:7.1f} ms")
+
+
+def bench_batch(rows=50):
+    """Render a roster that alternates between two templates, with and without the template cache"""
+    import render_engine
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_test_basepath(tmp)
+        image = make_test_image()
+        for name in ('bgs/template.png', 'bgs/template_alt.png'):
+            buffer = main.BytesIO()
+            image.save(buffer, format='PNG', compress_level=1)
+            crypto_utils.save_encrypted_binary_file(name, buffer.getvalue(), tmp)
+
+        people = [{'name': f"Person {i}", 'greetings': 'Happy Birthday!',
+                   'template': 'bgs/template_alt.png' if i % 2 else ''} for i in range(rows)]
+        config = {'render': [{'info': 'name', 'pos': {'x': 800, 'y': 400},
+                              'font': {'family': 'arial.ttf', 'size': 100, 'color': 'ffffff'}}],
+                  'output': {'format': 'bmp'}}
+        basepath, main.basepath = main.basepath, tmp
+        output_dir = os.path.join(tmp, 'out')
+        try:
+            def uncached():
+                for person in people:
+                    render_engine.template_cache.clear()
+                    main.render_batch([person], config, output_dir)
+
+            def cached():
+                render_engine.template_cache.clear()
+                main.render_batch(people, config, output_dir)
+
+            print(f"Batch render ({rows} people, 2 templates, {image.size[0]}x{image.size[1]}):")
+            for label, func in (('decode per person', uncached), ('template cache', cached)):
+                elapsed = time_call(func, repeat=1)
+                print(f"  {label:<18} {elapsed:9.1f} ms  {elapsed / rows:7.1f} ms/person")
+        finally:
+            main.basepath = basepath
+
+
+def bench_render(repeat=20):
+    """Time render_person on a 4K template and check it matches plain ImageDraw.text at scale 1.0"""
+    import render_engine
+
+    image = make_test_image()
+    person = {'name': 'Bernie', 'greetings': 'Happy Birthday!'}
+    # arial.ttf isn't installed everywhere and load_default() ignores the size,
+    # so time a real TrueType font: the one Pillow bundles
+    font_path = os.path.join(tempfile.mkdtemp(), 'default.ttf')
+    with open(font_path, 'wb') as f:
+        f.write(ImageFont.load_default(10).font_bytes)
+    config = {'render': [
+        {'info': 'name', 'pos': {'x': 800, 'y': 400}, 'font': {'family': font_path, 'size': 100, 'color': 'ffffff'}},
+        {'info': 'greetings', 'pos': {'x': 800, 'y': 600}, 'font': {'family': font_path, 'size': 50, 'color': 'aaaaaa'}},
+    ]}
+
+    reference = image.copy()
+    draw = ImageDraw.Draw(reference)
+    for item in config['render']:
+        font = render_engine.load_font(item['font']['family'], item['font']['size'])
+        draw.text((item['pos']['x'], item['pos']['y']), person[item['info']], font=font,
+                  fill=render_engine.hex_to_rgb(item['font']['color']))
+
+    rendered = image.copy()
+    render_engine.render_person(rendered, render_engine.compile_render_plan(config['render']), person)
+    identical = rendered.tobytes() == reference.tobytes()
+
+    def render():
+        target = image.copy()
+        render_engine.render_person(target, render_engine.compile_render_plan(config['render']), person)
+
+    effects = {'outline': {'width': 3}, 'shadow': {'blur': 6}, 'glow': {'radius': 12, 'color': 'ffff00'}}
+    effects_plan = render_engine.compile_render_plan(
+        [dict(item, effects=effects) for item in config['render']])
+
+    def render_effects():
+        target = image.copy()
+        render_engine.render_person(target, effects_plan, person)
+
+    def render_effects_uncached():
+        render_engine.text_sprites.cache.clear()
+        render_effects()
+
+    print(f"Render ({image.size[0]}x{image.size[1]}, {len(config['render'])} items):")
+    print(f"  render_person      {time_call(render, repeat):8.1f} ms  "
+          f"pixel-identical to ImageDraw.text: {'yes' if identical else 'NO'}")
+    print(f"  with effects       {time_call(render_effects, repeat):8.1f} ms  "
+          f"(masks rebuilt every time: {time_call(render_effects_uncached, repeat):.1f} ms)")
+    if not identical:
+        sys.exit(1)
+
+
+def evict_page_cache(directory):
+    """Drop the files under directory from the OS page cache (Linux), return False if unsupported"""
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for root, _, files in os.walk(directory):
+        for name in files:
+            fd = os.open(os.path.join(root, name), os.O_RDONLY)
+            try:
+                os.fdatasync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return True
+
+
+def bench_latency(runs=10):
+    """Compare birthday render latency with sequential and concurrent asset loading
+
+    Each run is a fresh process; the encrypted assets are evicted from the
+    page cache first where the OS allows it.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        make_test_basepath(tmp, birthday_today=True)
+        buffer = main.BytesIO()
+        make_test_image().save(buffer, format='PNG', compress_level=6)
+        crypto_utils.save_encrypted_binary_file('bgs/template.png', buffer.getvalue(), tmp)
+
+        env = dict(os.environ, BIRTHDAY_BG_BASEPATH=tmp + os.sep,
+                   BIRTHDAY_BG_WALLPAPER_BACKEND='file',
+                   BIRTHDAY_BG_WALLPAPER_TARGET=os.path.join(tmp, 'wallpaper'))
+        state_path = os.path.join(tmp, 'bgs', 'wallpaper_state.json')
+        cold = evict_page_cache(tmp)
+        print(f"Birthday render latency, 4K template, {'cold' if cold else 'warm'} "
+              f"asset cache (best/median of {runs} runs):")
+        for workers in (1, main.LOAD_WORKERS):
+            script = [sys.executable, '-c', f"import sys; sys.path.insert(0, {here!r}); import main; "
+                                            f"main.LOAD_WORKERS = {workers}; main.main()"]
+            times = []
+            for _ in range(runs):
+                if os.path.exists(state_path):
+                    os.remove(state_path)
+                evict_page_cache(tmp)
+                start = time.perf_counter()
+                subprocess.run(script, env=env, stdout=subprocess.DEVNULL, check=False)
+                times.append((time.perf_counter() - start) * 1000)
+            times.sort()
+            label = 'sequential' if workers == 1 else f"{workers} workers"
+            print(f"  {label:<11} best {times[0]:7.1f} ms  median {times[len(times) // 2]:7.1f} ms")
+
+
+def bench_fields(rows=100000):
+    """Time compiled info templates against parsing the template for every person"""
+    import csv
+    import io
+    import render_engine
+
+    people = list(csv.DictReader(io.StringIO(make_roster_csv(rows))))
+    templates = ['name', '{name}, {other_info}', '{name} turns {age}! ({days_until_birthday} days)']
+
+    print(f"Info templates ({rows} people):")
+    for info in templates:
+        text = render_engine.compile_info(info)
+
+        def compiled():
+            for person in people:
+                text(person)
+
+        def parsed():
+            for person in people:
+                # What rendering would cost without compiling: parse the template each time
+                render_engine.compile_info(info)(person)
+
+        compiled_ms = time_call(compiled, repeat=3)
+        parsed_ms = time_call(parsed, repeat=3)
+        print(f"  {info:<50} compiled {compiled_ms / rows * 1000:6.2f} us/person  "
+              f"parsed per render {parsed_ms / rows * 1000:6.2f} us/person")
+
+
+BENCHMARKS = {
+    'output': bench_output,
+    'ciphers': bench_ciphers,
+    'compression': bench_compression,
+    'coldstart': bench_coldstart,
+    'batch': bench_batch,
+    'render': bench_render,
+    'latency': bench_latency,
+    'fields': bench_fields,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (available: {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        BENCHMARKS[name]()
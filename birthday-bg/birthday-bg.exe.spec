@@ -1,5 +1,15 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# PIL plugins (and their native modules) for formats the wallpaper never reads
+# or writes: templates are PNG/JPEG/BMP/GIF, output is BMP/PNG/JPEG. Mpo and
+# Tiff stay, the JPEG plugin imports them for multi-picture files and EXIF.
+unused_pil_plugins = [
+    'Avif', 'Blp', 'BufrStub', 'Cur', 'Dcx', 'Dds', 'Eps', 'Fits', 'Fli', 'Fpx',
+    'Ftex', 'Gbr', 'GribStub', 'Hdf5Stub', 'Icns', 'Ico', 'Im', 'Imt', 'Iptc',
+    'Jpeg2K', 'McIdas', 'Mic', 'Mpeg', 'Msp', 'Palm', 'Pcd', 'Pcx', 'Pdf',
+    'Pixar', 'Ppm', 'Psd', 'Qoi', 'Sgi', 'Spider', 'Sun', 'Tga', 'WebP',
+    'Wmf', 'Xbm', 'Xpm', 'XVThumb',
+]
 
 a = Analysis(
     ['main.py'],
@@ -10,7 +20,10 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Modules only used by the editor/tools, kept out of the login-time exe
+    excludes=['tkinter', 'PIL.ImageTk', 'pandas', 'numpy', 'openpyxl',
+              'unittest', 'pydoc', 'doctest', 'PIL._avif', 'PIL._webp']
+             + [f'PIL.{name}ImagePlugin' for name in unused_pil_plugins],
     noarchive=False,
     optimize=0,
 )
@@ -26,7 +39,8 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # UPX-packed DLLs have to be unpacked again on every start
+    upx=False,
     upx_exclude=[],
     runtime_tmpdir=None,
     console=True,
@@ -0,0 +1,65 @@
+"""
+Birthday parsing and the fields derived from it
+
+Kept free of PIL so main.py can find today's birthdays without importing
+the render engine.
+"""
+
+import re
+from datetime import date
+
+
+def parse_birthday(value):
+    """Parse 'month.day' or 'year.month.day' ('-' and '/' work too)
+
+    Returns (year or None, month, day), None if it isn't a valid birthday.
+    """
+    try:
+        numbers = [int(part) for part in re.split(r'[./-]', str(value).strip())]
+    except ValueError:
+        return None
+    if len(numbers) == 2:
+        year, (month, day) = None, numbers
+    elif len(numbers) == 3:
+        year, month, day = numbers
+    else:
+        return None
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    return year, month, day
+
+
+def is_birthday(person, today=None):
+    """Check if person's birthday (with or without a year) falls on today"""
+    birthday = parse_birthday(person.get('birthday', ''))
+    today = today or date.today()
+    return birthday is not None and birthday[1:] == (today.month, today.day)
+
+
+def get_age(person, today=None):
+    """Age reached on this year's birthday, from a birthday with a year or a birth_year column"""
+    birthday = parse_birthday(person.get('birthday', ''))
+    year = birthday[0] if birthday else None
+    if year is None:
+        try:
+            year = int(person.get('birth_year', ''))
+        except ValueError:
+            return None
+    return (today or date.today()).year - year
+
+
+def get_days_until_birthday(person, today=None):
+    """Days until the next birthday, 0 on the birthday (Feb 29 counts as Mar 1 in other years)"""
+    birthday = parse_birthday(person.get('birthday', ''))
+    if birthday is None:
+        return None
+    _, month, day = birthday
+    today = today or date.today()
+    for year in (today.year, today.year + 1):
+        try:
+            next_birthday = date(year, month, day)
+        except ValueError:
+            next_birthday = date(year, 3, 1)
+        if next_birthday >= today:
+            return (next_birthday - today).days
+    return None
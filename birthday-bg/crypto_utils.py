@@ -1,9 +1,36 @@
+import codecs
 import hashlib
+import json
 import os
+import zlib
 
-# XOR key for encryption/decryption
+# XOR key for encryption/decryption of legacy files (no header)
 XOR_KEY = 0x7E
 
+# Key for the counter-mode stream ciphers
+STREAM_KEY = hashlib.sha256(b"birthday-bg stream key").digest()
+
+# Header of files written by the cipher layer:
+# magic + format version + cipher id + codec id (version 2+) + nonce
+MAGIC = b"BBGENC"
+FORMAT_VERSION = 2
+NONCE_SIZE = 16
+HEADER_SIZES = {1: len(MAGIC) + 2 + NONCE_SIZE, 2: len(MAGIC) + 3 + NONCE_SIZE}
+HEADER_SIZE = max(HEADER_SIZES.values())
+
+# Cipher used for newly written files
+DEFAULT_CIPHER = "shake256-ctr"
+
+# Compression applied before encryption, by original file extension.
+# Images are already compressed and stored as is.
+CODEC_BY_EXTENSION = {
+    ".csv": "zlib",
+    ".yaml": "zlib",
+}
+
+# Size of chunks read when streaming a file
+CHUNK_SIZE = 1024 * 1024
+
 # File mapping - original name to hash
 FILE_MAPPING = {
     "data.csv": "b87775cb83cbf0511096cfb67074662a.dat",
@@ -24,25 +51,220 @@ def get_encrypted_filename(original_filename):
     return f"{file_hash}.dat"
 
 
+_XOR_TABLE = bytes(byte ^ XOR_KEY for byte in range(256))
+
+
 def xor_encrypt_decrypt(data):
     """XOR encrypt/decrypt data (same operation for both)"""
     if isinstance(data, str):
         data = data.encode("utf-8")
 
-    result = bytearray()
-    for byte in data:
-        result.append(byte ^ XOR_KEY)
+    return bytes(data).translate(_XOR_TABLE)
+
+
+class XorCipher:
+    """Legacy single-byte XOR, used for files without a header"""
+    name = "xor"
+    cipher_id = 0
+
+    def __init__(self, nonce=b""):
+        self.nonce = b""
+
+    def apply(self, data, offset=0):
+        """Encrypt/decrypt data located at offset in the stream"""
+        return xor_encrypt_decrypt(data)
+
+
+class CounterModeCipher:
+    """Stream cipher XORing data with hash(key, nonce, counter) blocks
+
+    Block n of the keystream only depends on n, so any byte range can be
+    decrypted independently by seeking to its block.
+    """
+    name = None
+    cipher_id = None
+    block_size = None
+
+    def __init__(self, nonce, key=STREAM_KEY):
+        self.nonce = nonce
+        self.key = key
+
+    def block(self, counter):
+        """Get keystream block number counter"""
+        raise NotImplementedError
+
+    def keystream(self, offset, length):
+        """Get length keystream bytes starting at offset"""
+        first = offset // self.block_size
+        last = (offset + length - 1) // self.block_size
+        stream = b"".join(self.block(counter) for counter in range(first, last + 1))
+        start = offset - first * self.block_size
+        return stream[start:start + length]
+
+    def apply(self, data, offset=0):
+        """Encrypt/decrypt data located at offset in the stream"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        length = len(data)
+        if not length:
+            return b""
+        stream = self.keystream(offset, length)
+        return (int.from_bytes(data, "little") ^ int.from_bytes(stream, "little")).to_bytes(length, "little")
+
+
+class Blake2CtrCipher(CounterModeCipher):
+    """Counter mode with keyed BLAKE2b, 64-byte blocks"""
+    name = "blake2b-ctr"
+    cipher_id = 1
+    block_size = 64
+
+    def __init__(self, nonce, key=STREAM_KEY):
+        super().__init__(nonce, key)
+        self.base = hashlib.blake2b(key=key, digest_size=64)
+
+    def block(self, counter):
+        block = self.base.copy()
+        block.update(self.nonce + counter.to_bytes(8, "little"))
+        return block.digest()
+
+
+class Shake256CtrCipher(CounterModeCipher):
+    """Counter mode with SHAKE-256, 4 KiB blocks (fewer hash calls per MB)"""
+    name = "shake256-ctr"
+    cipher_id = 2
+    block_size = 4096
+
+    def block(self, counter):
+        return hashlib.shake_256(self.key + self.nonce + counter.to_bytes(8, "little")).digest(self.block_size)
+
+
+CIPHERS = {cipher.name: cipher for cipher in (XorCipher, Blake2CtrCipher, Shake256CtrCipher)}
+CIPHERS_BY_ID = {cipher.cipher_id: cipher for cipher in CIPHERS.values()}
+
+
+class NullCodec:
+    """Pass-through (de)compressor for uncompressed files"""
+
+    def compress(self, data):
+        return data
+
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b""
+
+
+def lzma_compressor():
+    """Create an LZMA compressor (lzma is imported on demand, it's slow to load)"""
+    import lzma
+    return lzma.LZMACompressor()
+
+
+def lzma_decompressor():
+    """Create an LZMA decompressor"""
+    import lzma
+    return lzma.LZMADecompressor()
+
+
+CODECS = {
+    "none": {"id": 0, "compressor": NullCodec, "decompressor": NullCodec},
+    "zlib": {"id": 1, "compressor": zlib.compressobj, "decompressor": zlib.decompressobj},
+    "lzma": {"id": 2, "compressor": lzma_compressor, "decompressor": lzma_decompressor},
+}
+CODECS_BY_ID = {codec["id"]: name for name, codec in CODECS.items()}
+
+
+def get_codec_for_path(original_path):
+    """Get the compression codec used for a file type"""
+    return CODEC_BY_EXTENSION.get(os.path.splitext(original_path)[1].lower(), "none")
+
+
+def new_decompressor(codec_name):
+    """Create a streaming decompressor for a codec"""
+    return CODECS[codec_name]["decompressor"]()
+
+
+def finish_decompressor(decompressor):
+    """Get data still buffered in a decompressor (lzma has no flush)"""
+    flush = getattr(decompressor, "flush", None)
+    return flush() if flush else b""
+
 
-    return bytes(result)
+def new_header(cipher_name=None, codec_name="none"):
+    """Create a cipher with a fresh nonce, return (cipher, header)"""
+    cipher_class = CIPHERS[cipher_name or DEFAULT_CIPHER]
+    if cipher_class is XorCipher:
+        # Legacy format has no header, so it can't record a codec either
+        if codec_name != "none":
+            raise ValueError("Legacy XOR files can't be compressed")
+        return XorCipher(), b""
+    nonce = os.urandom(NONCE_SIZE)
+    header = MAGIC + bytes([FORMAT_VERSION, cipher_class.cipher_id, CODECS[codec_name]["id"]]) + nonce
+    return cipher_class(nonce), header
 
 
-def encrypt_file(source_path, encrypted_path):
+def parse_header(header):
+    """Get (cipher, codec name, header size) from the first HEADER_SIZE bytes of a file"""
+    if len(header) <= len(MAGIC) or not header.startswith(MAGIC):
+        return XorCipher(), "none", 0
+    version = header[len(MAGIC)]
+    header_size = HEADER_SIZES.get(version)
+    if header_size is None or len(header) < header_size:
+        raise ValueError(f"Unsupported encrypted file format version {version}")
+
+    cipher_id = header[len(MAGIC) + 1]
+    codec_id = header[len(MAGIC) + 2] if version >= 2 else 0
+    if cipher_id not in CIPHERS_BY_ID or codec_id not in CODECS_BY_ID:
+        raise ValueError(f"Unsupported encrypted file format {version}/{cipher_id}/{codec_id}")
+    nonce = header[header_size - NONCE_SIZE:header_size]
+    return CIPHERS_BY_ID[cipher_id](nonce), CODECS_BY_ID[codec_id], header_size
+
+
+def encrypt_bytes(data, cipher_name=None, codec_name="none"):
+    """Compress and encrypt text or bytes, return header + encrypted data"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    cipher, header = new_header(cipher_name, codec_name)
+    compressor = CODECS[codec_name]["compressor"]()
+    data = compressor.compress(data) + compressor.flush()
+    return header + cipher.apply(data)
+
+
+def decrypt_bytes(encrypted_data):
+    """Decrypt data produced by encrypt_bytes or the legacy XOR format"""
+    cipher, codec_name, header_size = parse_header(encrypted_data[:HEADER_SIZE])
+    decompressor = new_decompressor(codec_name)
+    data = decompressor.decompress(cipher.apply(encrypted_data[header_size:]))
+    return data + finish_decompressor(decompressor)
+
+
+def iter_decrypted_chunks(encrypted_path, chunk_size=CHUNK_SIZE):
+    """Yield decrypted and decompressed data of a file chunk by chunk"""
+    with open(encrypted_path, "rb") as f:
+        cipher, codec_name, header_size = parse_header(f.read(HEADER_SIZE))
+        f.seek(header_size)
+        decompressor = new_decompressor(codec_name)
+        offset = 0
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            data = decompressor.decompress(cipher.apply(chunk, offset))
+            offset += len(chunk)
+            if data:
+                yield data
+        data = finish_decompressor(decompressor)
+        if data:
+            yield data
+
+
+def encrypt_file(source_path, encrypted_path, cipher_name=None, codec_name=None):
     """Encrypt a file and save to encrypted path"""
     try:
         with open(source_path, "rb") as f:
             data = f.read()
 
-        encrypted_data = xor_encrypt_decrypt(data)
+        if codec_name is None:
+            codec_name = get_codec_for_path(source_path)
+        encrypted_data = encrypt_bytes(data, cipher_name, codec_name)
 
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(encrypted_path), exist_ok=True)
@@ -62,7 +284,7 @@ def decrypt_file(encrypted_path, output_path=None):
         with open(encrypted_path, "rb") as f:
             encrypted_data = f.read()
 
-        decrypted_data = xor_encrypt_decrypt(encrypted_data)
+        decrypted_data = decrypt_bytes(encrypted_data)
 
         if output_path:
             # Create directory if it doesn't exist
@@ -78,6 +300,23 @@ def decrypt_file(encrypted_path, output_path=None):
         return None
 
 
+def decrypt_range(encrypted_path, offset, length):
+    """Decrypt length bytes at offset of the original data without reading the whole file
+
+    Only works for uncompressed files (e.g. images).
+    """
+    try:
+        with open(encrypted_path, "rb") as f:
+            cipher, codec_name, header_size = parse_header(f.read(HEADER_SIZE))
+            if codec_name != "none":
+                raise ValueError(f"Can't seek in {codec_name} compressed data")
+            f.seek(header_size + offset)
+            return cipher.apply(f.read(length), offset)
+    except Exception as e:
+        print(f"Error decrypting file {encrypted_path}: {e}")
+        return None
+
+
 def get_encrypted_path(original_path):
     """Get the encrypted path for an original file path"""
     encrypted_filename = get_encrypted_filename(original_path)
@@ -98,21 +337,27 @@ def load_encrypted_text_file(original_path, basepath=""):
     if not os.path.exists(encrypted_path):
         return None
 
-    decrypted_data = decrypt_file(encrypted_path)
-    if decrypted_data:
-        return decrypted_data.decode("utf-8")
-    return None
+    # Stream-decrypt, decompress and decode so the compressed file is read once
+    try:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        parts = [decoder.decode(chunk) for chunk in iter_decrypted_chunks(encrypted_path)]
+        parts.append(decoder.decode(b"", final=True))
+        content = "".join(parts)
+    except Exception as e:
+        print(f"Error decrypting file {encrypted_path}: {e}")
+        return None
+    return content or None
 
 
-def save_encrypted_text_file(original_path, content):
+def save_encrypted_text_file(original_path, content, basepath=""):
     """Encrypt and save text content to file"""
-    encrypted_path = get_encrypted_path(original_path)
+    encrypted_path = os.path.join(basepath, get_encrypted_path(original_path))
 
     # Create directory if needed
     if os.path.dirname(encrypted_path):
         os.makedirs(os.path.dirname(encrypted_path), exist_ok=True)
 
-    encrypted_data = xor_encrypt_decrypt(content)
+    encrypted_data = encrypt_bytes(content, codec_name=get_codec_for_path(original_path))
 
     try:
         with open(encrypted_path, "wb") as f:
@@ -123,6 +368,63 @@ def save_encrypted_text_file(original_path, content):
         return False
 
 
+class EncryptedFileWriter:
+    """Encrypt and write a file chunk by chunk
+
+    Data goes to a temporary file that replaces the encrypted file on close,
+    so readers never see a half-written file.
+    """
+
+    def __init__(self, original_path, basepath="", cipher_name=None, codec_name=None):
+        self.encrypted_path = os.path.join(basepath, get_encrypted_path(original_path))
+        self.temp_path = self.encrypted_path + ".tmp"
+        if os.path.dirname(self.encrypted_path):
+            os.makedirs(os.path.dirname(self.encrypted_path), exist_ok=True)
+        if codec_name is None:
+            codec_name = get_codec_for_path(original_path)
+        self.cipher, header = new_header(cipher_name, codec_name)
+        self.compressor = CODECS[codec_name]["compressor"]()
+        self.offset = 0
+        self.file = open(self.temp_path, "wb")
+        self.file.write(header)
+
+    def write_encrypted(self, data):
+        """Encrypt and write already compressed bytes"""
+        if data:
+            self.file.write(self.cipher.apply(data, self.offset))
+            self.offset += len(data)
+
+    def write(self, data):
+        """Compress, encrypt and write a chunk of text or bytes"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.write_encrypted(self.compressor.compress(data))
+
+    def close(self):
+        """Finish writing and replace the encrypted file"""
+        self.write_encrypted(self.compressor.flush())
+        self.file.close()
+        os.replace(self.temp_path, self.encrypted_path)
+
+    def abort(self):
+        """Discard everything written so far"""
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
 def load_encrypted_binary_file(original_path, basepath=""):
     """Load and decrypt a binary file, return as bytes"""
     encrypted_path = get_encrypted_path(original_path)
@@ -134,14 +436,14 @@ def load_encrypted_binary_file(original_path, basepath=""):
     return decrypt_file(encrypted_path)
 
 
-def save_encrypted_binary_file(original_path, data):
+def save_encrypted_binary_file(original_path, data, basepath=""):
     """Encrypt and save binary data to file"""
-    encrypted_path = get_encrypted_path(original_path)
+    encrypted_path = os.path.join(basepath, get_encrypted_path(original_path))
 
     # Create directory if needed
     os.makedirs(os.path.dirname(encrypted_path), exist_ok=True)
 
-    encrypted_data = xor_encrypt_decrypt(data)
+    encrypted_data = encrypt_bytes(data, codec_name=get_codec_for_path(original_path))
 
     try:
         with open(encrypted_path, "wb") as f:
@@ -152,6 +454,80 @@ def save_encrypted_binary_file(original_path, data):
         return False
 
 
+def get_file_checksum(path):
+    """Get SHA-256 checksum of a file"""
+    checksum = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def get_encrypted_file_signature(original_path, basepath=""):
+    """Get [size, mtime_ns] of an encrypted file, None if it doesn't exist"""
+    encrypted_path = os.path.join(basepath, get_encrypted_path(original_path))
+    try:
+        stat = os.stat(encrypted_path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def get_cached_decrypted_file(original_path, cache_path, basepath=""):
+    """Get path to a persistent decrypted copy of an encrypted file
+
+    The copy is validated against the encrypted file's size, mtime and checksum
+    (stored next to it in cache_path + '.json'). While size and mtime match,
+    this costs only a few stats; the checksum is recomputed only when they
+    change, and the file is decrypted again only when the checksum changes.
+    """
+    encrypted_path = os.path.join(basepath, get_encrypted_path(original_path))
+    meta_path = cache_path + ".json"
+
+    try:
+        source_stat = os.stat(encrypted_path)
+    except OSError:
+        return None
+
+    meta = {}
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        cache_size = os.path.getsize(cache_path)
+    except OSError:
+        cache_size = None
+
+    cache_valid = cache_size is not None and meta.get("cache_size") == cache_size
+    if (cache_valid and meta.get("size") == source_stat.st_size
+            and meta.get("mtime_ns") == source_stat.st_mtime_ns):
+        return cache_path
+
+    try:
+        checksum = get_file_checksum(encrypted_path)
+        if not (cache_valid and meta.get("checksum") == checksum):
+            if decrypt_file(encrypted_path, cache_path + ".tmp") is not True:
+                return None
+            os.replace(cache_path + ".tmp", cache_path)
+            cache_size = os.path.getsize(cache_path)
+
+        meta = {
+            "size": source_stat.st_size,
+            "mtime_ns": source_stat.st_mtime_ns,
+            "checksum": checksum,
+            "cache_size": cache_size,
+        }
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        return cache_path
+    except Exception as e:
+        print(f"Error updating decrypted cache {cache_path}: {e}")
+        return None
+
+
 # Initialize file mapping
 # for original_file in FILE_MAPPING.keys():
 #     FILE_MAPPING[original_file] = get_encrypted_filename(original_file)
@@ -0,0 +1,125 @@
+"""
+Streaming import of roster files (CSV or XLSX) into the encrypted data.csv
+"""
+
+import csv
+import os
+from contextlib import nullcontext
+from datetime import date, datetime
+from io import StringIO
+from crypto_utils import EncryptedFileWriter
+
+# Rows encrypted and written per chunk
+CHUNK_ROWS = 1000
+# Column whose dates are stored as "year.month.day" (see birthdays.parse_birthday)
+BIRTHDAY_COLUMN = 'birthday'
+
+
+def iter_csv_rows(file_path):
+    """Yield (row values, progress 0..1) from a CSV file"""
+    total = os.path.getsize(file_path) or 1
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.reader(f):
+            yield row, f.buffer.tell() / total
+
+
+def iter_xlsx_rows(file_path):
+    """Yield (row values, progress 0..1) from the first sheet of an XLSX file"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        total = sheet.max_row or 1
+        for i, row in enumerate(sheet.iter_rows(values_only=True), 1):
+            yield list(row), i / total
+    finally:
+        workbook.close()
+
+
+def normalize_value(value, birthday=False):
+    """Convert a cell value to the stripped string stored in data.csv
+
+    Dates become "year.month.day" in the birthday column (the year gives
+{age}) and ISO strings elsewhere.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        if birthday:
+            return f"{value.year}.{value.month}.{value.day}"
+        if isinstance(value, datetime):
+            if value.time() == datetime.min.time():
+                # Spreadsheets store plain dates as midnight datetimes
+                return value.date().isoformat()
+            return value.isoformat(sep=' ')
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def import_roster(file_path, original_path='data.csv', basepath='', progress=None, suppress=None):
+    """Import a CSV/XLSX roster in one pass
+
+    Rows are normalized, written to the encrypted file in chunks and
+    collected into the in-memory roster, which is returned. progress is
+    called with a fraction between 0 and 1. suppress(original_path) is
+    entered around replacing the encrypted file (AssetWatcher.suppress).
+    """
+    if file_path.lower().endswith('.xlsx'):
+        rows = iter_xlsx_rows(file_path)
+    else:
+        rows = iter_csv_rows(file_path)
+
+    people = []
+    header = None
+    birthday_index = -1
+    buffer = StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    last_reported = -1.0
+
+    encrypted = EncryptedFileWriter(original_path, basepath)
+    try:
+        for values, fraction in rows:
+            if header is None:
+                values = [normalize_value(value) for value in values]
+                # Drop trailing empty header cells left by spreadsheet editors
+                while values and not values[-1]:
+                    values.pop()
+                header = values
+                if BIRTHDAY_COLUMN in header:
+                    birthday_index = header.index(BIRTHDAY_COLUMN)
+                writer.writerow(header)
+                continue
+
+            values = [normalize_value(value, i == birthday_index) for i, value in enumerate(values)]
+            if not any(values):
+                continue
+
+            values = (values + [''] * len(header))[:len(header)]
+            writer.writerow(values)
+            people.append(dict(zip(header, values)))
+
+            if len(people) % CHUNK_ROWS == 0:
+                encrypted.write(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate()
+            if progress and fraction - last_reported >= 0.01:
+                last_reported = fraction
+                progress(fraction)
+
+        if header is None:
+            raise ValueError("Data file is empty")
+        encrypted.write(buffer.getvalue())
+    except BaseException:
+        encrypted.abort()
+        raise
+
+    # Rows went to a temporary file, the encrypted file is only replaced here
+    with suppress(original_path) if suppress else nullcontext():
+        encrypted.close()
+
+    if progress:
+        progress(1.0)
+    return people
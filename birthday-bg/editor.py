@@ -1,15 +1,44 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, colorchooser
+from tkinter import ttk, filedialog, messagebox, colorchooser, simpledialog
 import yaml
 import csv
-import pandas as pd
 import os
 import glob
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageTk
 import shutil
 from crypto_utils import (load_encrypted_text_file, save_encrypted_text_file,
-                         load_encrypted_binary_file, save_encrypted_binary_file)
-from io import StringIO, BytesIO
+                         save_encrypted_binary_file)
+from render_engine import (text_sprites, save_template_pyramid, scaled_templates,
+                           invalidate_caches, get_person_template, compile_render_plan,
+                           render_person, get_overflowing_items, get_template_paths,
+                           DEFAULT_TEMPLATE, EFFECT_DEFAULTS, DERIVED_FIELDS)
+from asset_watcher import AssetWatcher
+from roster_index import RosterIndex
+from data_import import import_roster
+from io import StringIO
+
+# Delay after the last interaction before the full quality preview (ms)
+PREVIEW_IDLE_DELAY = 200
+# Font sizes in draft previews are rounded down to a multiple of this
+DRAFT_FONT_STEP = 4
+# Interval for applying asset changes reported by the watcher thread (ms)
+ASSET_POLL_INTERVAL = 500
+# Edit Item fields of each text effect: (field, label), shadow x/y are its offset
+EFFECT_FIELDS = (
+    ('outline', (('width', 'W'), ('color', 'Color'))),
+    ('shadow', (('x', 'X'), ('y', 'Y'), ('blur', 'Blur'), ('color', 'Color'))),
+    ('glow', (('radius', 'R'), ('color', 'Color'))),
+)
+# Thumbnail grid: people shown by default, thumbnail box (px) and render threads
+THUMBNAIL_COUNT = 24
+THUMBNAIL_SIZE = (240, 135)
+THUMBNAIL_WORKERS = min(4, os.cpu_count() or 1)
+# Interval for collecting finished thumbnails (ms)
+THUMBNAIL_POLL_INTERVAL = 30
 
 class PasswordDialog:
     def __init__(self, parent=None, mode=1):
@@ -221,6 +250,296 @@ class PasswordDialog:
         self.dialog.wait_window()
         return self.result
 
+class VirtualListView(ttk.Frame):
+    """Scrollable list that only creates canvas items for the visible rows"""
+    
+    def __init__(self, parent, row_height=20, height=6, on_select=None):
+        super().__init__(parent)
+        self.row_height = row_height
+        self.on_select = on_select
+        self.items = []
+        self.get_text = str
+        self.first_row = 0
+        self.selected = None
+        self.row_items = []  # Pool of (background, text) canvas item ids
+        
+        self.canvas = tk.Canvas(self, height=row_height * height, bg='white',
+                                highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.canvas.bind('<Configure>', lambda e: self.redraw())
+        self.canvas.bind('<Button-1>', self.on_click)
+        self.canvas.bind('<MouseWheel>', lambda e: self.yview('scroll', -e.delta // 120, 'units'))
+        self.canvas.bind('<Button-4>', lambda e: self.yview('scroll', -1, 'units'))
+        self.canvas.bind('<Button-5>', lambda e: self.yview('scroll', 1, 'units'))
+    
+    def set_items(self, items, get_text=str):
+        """Set list items (any sequence) and the function that labels them"""
+        self.items = items
+        self.get_text = get_text
+        self.first_row = 0
+        self.selected = None
+        self.redraw()
+    
+    def visible_rows(self):
+        """Number of rows that fit in the canvas"""
+        height = self.canvas.winfo_height()
+        if height <= 1:
+            height = int(self.canvas['height'])
+        return height // self.row_height + 1
+    
+    def yview(self, *args):
+        """Scrollbar command: 'moveto' fraction or 'scroll' n units/pages"""
+        max_first = max(0, len(self.items) - self.visible_rows() + 1)
+        if args[0] == 'moveto':
+            self.first_row = int(float(args[1]) * len(self.items))
+        elif args[0] == 'scroll':
+            step = self.visible_rows() - 1 if args[2] == 'pages' else 1
+            self.first_row += int(args[1]) * step
+        self.first_row = max(0, min(self.first_row, max_first))
+        self.redraw()
+    
+    def redraw(self):
+        """Update the pooled canvas items for the current scroll position"""
+        rows = self.visible_rows()
+        width = self.canvas.winfo_width()
+        
+        # Grow the pool only up to the number of visible rows
+        while len(self.row_items) < rows:
+            y = len(self.row_items) * self.row_height
+            background = self.canvas.create_rectangle(0, y, 0, y + self.row_height,
+                                                      outline='', fill='')
+            text = self.canvas.create_text(4, y + self.row_height // 2, anchor=tk.W, text='')
+            self.row_items.append((background, text))
+        
+        for offset, (background, text) in enumerate(self.row_items):
+            index = self.first_row + offset
+            y = offset * self.row_height
+            self.canvas.coords(background, 0, y, width, y + self.row_height)
+            if offset < rows and index < len(self.items):
+                selected = index == self.selected
+                self.canvas.itemconfigure(text, text=self.get_text(self.items[index]),
+                                          fill='white' if selected else 'black')
+                self.canvas.itemconfigure(background, fill='#0078d7' if selected else '')
+            else:
+                self.canvas.itemconfigure(text, text='')
+                self.canvas.itemconfigure(background, fill='')
+        
+        if self.items:
+            start = self.first_row / len(self.items)
+            end = min(1.0, (self.first_row + rows - 1) / len(self.items))
+            self.scrollbar.set(start, end)
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def on_click(self, event):
+        """Select the clicked row"""
+        index = self.first_row + event.y // self.row_height
+        if 0 <= index < len(self.items):
+            self.selected = index
+            self.redraw()
+            if self.on_select:
+                self.on_select(self.items[index])
+
+class ThumbnailGrid(tk.Toplevel):
+    """Small renders of many people at once, to catch text running off the template
+    
+    Thumbnails are rendered by a worker pool from shared downscaled templates
+    and fill in as they finish. A refresh (config change) cancels the renders
+    still queued for the previous config. Rows whose text runs off the
+    full-size template are flagged in red.
+    """
+    
+    def __init__(self, editor, count=THUMBNAIL_COUNT):
+        super().__init__(editor.root)
+        self.editor = editor
+        self.title("Thumbnail Grid")
+        self.geometry("1040x760")
+        
+        self.pool = ThreadPoolExecutor(THUMBNAIL_WORKERS)
+        self.results = queue.Queue()
+        self.generation = 0  # Bumped by each refresh, older results are dropped
+        self.futures = []
+        self.pending = 0
+        self.overflowing = 0
+        self.errors = 0
+        self.photos = []  # Keeps the PhotoImages shown on the canvas alive
+        self.refresh_job = None
+        self.poll_job = None
+        
+        toolbar = ttk.Frame(self, padding=5)
+        toolbar.pack(fill=tk.X)
+        ttk.Label(toolbar, text="People:").pack(side=tk.LEFT)
+        self.count_var = tk.StringVar(value=str(count))
+        ttk.Spinbox(toolbar, from_=1, to=500, width=5, textvariable=self.count_var,
+                    command=self.request_refresh).pack(side=tk.LEFT, padx=5)
+        self.sample_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(toolbar, text="Random sample", variable=self.sample_var,
+                        command=self.request_refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="Refresh", command=self.refresh).pack(side=tk.LEFT, padx=5)
+        self.status_var = tk.StringVar()
+        ttk.Label(toolbar, textvariable=self.status_var).pack(side=tk.LEFT, padx=10)
+        
+        frame = ttk.Frame(self)
+        frame.pack(fill=tk.BOTH, expand=True)
+        self.canvas = tk.Canvas(frame, bg='white')
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+    
+    def get_people(self):
+        """Get roster indexes to show: the Preview Person matches, or a random sample of them"""
+        try:
+            count = max(1, int(self.count_var.get()))
+        except ValueError:
+            count = THUMBNAIL_COUNT
+        matches = self.editor.person_list.items
+        if self.sample_var.get() and len(matches) > count:
+            return [matches[i] for i in sorted(random.sample(range(len(matches)), count))]
+        return [matches[i] for i in range(min(count, len(matches)))]
+    
+    def get_base(self, template_path):
+        """Get (scale, template fitted into THUMBNAIL_SIZE, full size), None if missing"""
+        return scaled_templates.get(template_path, THUMBNAIL_SIZE)
+    
+    def request_refresh(self):
+        """Refresh once edits have settled"""
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+        self.refresh_job = self.after(PREVIEW_IDLE_DELAY, self.refresh)
+    
+    def cancel(self):
+        """Cancel the thumbnails still queued, running ones finish and are dropped"""
+        self.generation += 1
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+        self.pending = 0
+    
+    def cell_position(self, cell):
+        """Get the canvas position of a grid cell"""
+        cell_width = THUMBNAIL_SIZE[0] + 10
+        cell_height = THUMBNAIL_SIZE[1] + 40
+        columns = max(1, (self.canvas.winfo_width() or 1040) // cell_width)
+        return 5 + (cell % columns) * cell_width, 5 + (cell // columns) * cell_height
+    
+    def refresh(self):
+        """Render thumbnails for the current config and people"""
+        self.refresh_job = None
+        self.cancel()
+        generation = self.generation
+        self.canvas.delete("all")
+        self.photos = []
+        self.overflowing = 0
+        self.errors = 0
+        
+        data = self.editor.data
+        config = self.editor.config
+        plan = compile_render_plan(config.get('render', []))
+        people = [index for index in self.get_people() if 0 <= index < len(data)]
+        for cell, index in enumerate(people):
+            person = data[index]
+            x, y = self.cell_position(cell)
+            base = self.get_base(get_person_template(person, config))
+            if base is None:
+                self.canvas.create_text(x, y, anchor=tk.NW, text="No template image found", fill='red')
+                continue
+            self.futures.append(self.pool.submit(self.render_thumbnail, generation, cell,
+                                                 index, person, plan, base))
+        self.pending = len(self.futures)
+        
+        if people:
+            x, y = self.cell_position(len(people) - 1)
+            self.canvas.configure(scrollregion=(0, 0, x + THUMBNAIL_SIZE[0] + 10,
+                                                y + THUMBNAIL_SIZE[1] + 40))
+        self.update_status()
+        if self.poll_job is None:
+            self.poll_job = self.after(THUMBNAIL_POLL_INTERVAL, self.poll_results)
+    
+    def render_thumbnail(self, generation, cell, index, person, plan, base):
+        """Worker: render one thumbnail and measure its overflow"""
+        if generation != self.generation:
+            return
+        scale, base_image, full_size = base
+        try:
+            image = base_image.copy()
+            missing = lambda info_field: f'[{info_field}]'
+            render_person(image, plan, person, scale, missing=missing)
+            overflowing = get_overflowing_items(plan, person, full_size, missing)
+            error = None
+        except Exception as e:
+            # Shown on the tile, there is no console in the windowed build
+            image, overflowing, error = None, [], f"{type(e).__name__}: {e}"
+        self.results.put((generation, cell, index, image, overflowing, error))
+    
+    def poll_results(self):
+        """Show finished thumbnails, keep polling while renders are pending"""
+        self.poll_job = None
+        try:
+            while True:
+                generation, cell, index, image, overflowing, error = self.results.get_nowait()
+                if generation == self.generation:
+                    self.show_thumbnail(cell, index, image, overflowing, error)
+        except queue.Empty:
+            pass
+        self.update_status()
+        if self.pending > 0:
+            self.poll_job = self.after(THUMBNAIL_POLL_INTERVAL, self.poll_results)
+    
+    def show_thumbnail(self, cell, index, image, overflowing, error=None):
+        """Draw a finished thumbnail and its caption, or the render error"""
+        self.pending -= 1
+        x, y = self.cell_position(cell)
+        if image is None:
+            self.errors += 1
+            self.canvas.create_rectangle(x, y, x + THUMBNAIL_SIZE[0], y + THUMBNAIL_SIZE[1],
+                                         outline='red', width=2)
+            self.canvas.create_text(x + 4, y + 4, anchor=tk.NW, fill='red',
+                                    text=f"{self.editor.person_label(index)}\nRender error: {error}",
+                                    width=THUMBNAIL_SIZE[0] - 8)
+            return
+        photo = ImageTk.PhotoImage(image)
+        self.photos.append(photo)
+        self.canvas.create_image(x, y, anchor=tk.NW, image=photo)
+        
+        caption = self.editor.person_label(index)
+        color = 'black'
+        if overflowing:
+            self.overflowing += 1
+            color = 'red'
+            render_items = self.editor.config.get('render', [])
+            fields = ', '.join(str(render_items[i].get('info', '')) for i in overflowing
+                               if i < len(render_items))
+            caption += f"\noverflow: {fields}"
+            self.canvas.create_rectangle(x, y, x + image.width, y + image.height,
+                                         outline='red', width=2)
+        self.canvas.create_text(x, y + image.height + 2, anchor=tk.NW, text=caption,
+                                fill=color, width=THUMBNAIL_SIZE[0])
+    
+    def update_status(self):
+        status = f"{self.overflowing} overflowing"
+        if self.errors:
+            status += f", {self.errors} failed"
+        if self.pending > 0:
+            status += f", rendering {self.pending}..."
+        self.status_var.set(status)
+    
+    def close(self):
+        """Cancel pending renders and close the window"""
+        self.cancel()
+        for job in (self.refresh_job, self.poll_job):
+            if job is not None:
+                self.after_cancel(job)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.editor.thumbnail_grid = None
+        self.destroy()
+
 class BirthdayBackgroundEditor:
     def __init__(self, root):
         self.root = root
@@ -230,14 +549,30 @@ class BirthdayBackgroundEditor:
         # Initialize data
         self.config = self.load_config()
         self.data = self.load_data()
-        self.template_image = None
         self.preview_image = None
         self.current_item_index = -1
+        self.preview_person_index = 0
+        self.roster_index = RosterIndex(self.data)
+        self.render_buffer = None  # Reused preview image buffer
+        self.preview_item = None  # Canvas image item showing self.preview_image
+        self.draft_job = None
+        self.idle_render_job = None
+        self.preview_items = []  # Drawn render items: index, canvas bbox, text and font
+        self.drag = None  # Render item being dragged on the canvas
+        self.thumbnail_grid = None  # Open ThumbnailGrid window
         
         # Setup UI
         self.setup_ui()
         self.refresh_preview()
         
+        # Reload whatever another editor or script changes on disk
+        self.asset_changes = queue.Queue()
+        self.watcher = AssetWatcher()
+        self.watch_templates()
+        self.watcher.subscribe(lambda changed, invalidated: self.asset_changes.put(invalidated))
+        self.watcher.start()
+        self.root.after(ASSET_POLL_INTERVAL, self.poll_asset_changes)
+        
     def load_config(self):
         """Load configuration from encrypted YAML file"""
         try:
@@ -249,11 +584,53 @@ class BirthdayBackgroundEditor:
         except:
             return {'render': []}
     
+    def watch_templates(self):
+        """Watch every template the config and roster can pick, not just the default"""
+        self.watcher.watch(*get_template_paths(self.config, self.data))
+    
+    def poll_asset_changes(self):
+        """Apply asset changes reported by the watcher thread"""
+        invalidated = set()
+        try:
+            while True:
+                invalidated |= self.asset_changes.get_nowait()
+        except queue.Empty:
+            pass
+        if invalidated:
+            self.on_assets_changed(invalidated)
+        self.root.after(ASSET_POLL_INTERVAL, self.poll_asset_changes)
+    
+    def on_assets_changed(self, invalidated):
+        """Reload the parts of the editor that depend on changed assets"""
+        invalidate_caches(invalidated)
+        if 'roster_index' in invalidated:
+            self.data = self.load_data()
+            if self.data:
+                self.info_combo['values'] = self.get_info_fields()
+            self.preview_person_index = 0
+            self.roster_index = RosterIndex(self.data)
+            self.update_person_list()
+        if 'render_plan' in invalidated:
+            self.config = self.load_config()
+            self.current_item_index = -1
+            self.update_render_list()
+            self.clear_edit_fields()
+        if invalidated & {'roster_index', 'render_plan'}:
+            self.watch_templates()
+        # Scaled templates are revalidated by render_engine.scaled_templates
+        self.request_preview()
+        if self.thumbnail_grid is not None:
+            self.thumbnail_grid.request_refresh()
+    
     def save_config(self):
         """Save configuration to encrypted YAML file"""
         try:
             yaml_content = yaml.dump(self.config, default_flow_style=False, allow_unicode=True)
-            success = save_encrypted_text_file('config.yaml', yaml_content)
+            with self.watcher.suppress('config.yaml'):
+                success = save_encrypted_text_file('config.yaml', yaml_content)
+            self.watch_templates()
+            if self.thumbnail_grid is not None:
+                self.thumbnail_grid.request_refresh()
             if not success:
                 messagebox.showerror("Error", "Failed to save encrypted config file")
         except Exception as e:
@@ -278,6 +655,14 @@ class BirthdayBackgroundEditor:
         except:
             return []
     
+    def get_info_fields(self):
+        """Get the Info Field choices: CSV columns, then derived fields
+
+        Format templates such as "{name}, {other_info}" can be typed in as well.
+        """
+        columns = list(self.data[0].keys()) if self.data else []
+        return columns + [field for field in DERIVED_FIELDS if field not in columns]
+    
     def get_system_fonts(self):
         """Get list of system fonts"""
         font_dir = "C:/Windows/Fonts/"
@@ -302,10 +687,29 @@ class BirthdayBackgroundEditor:
         
         ttk.Button(upload_frame, text="Upload Template", 
                   command=self.upload_template).pack(fill=tk.X, pady=2)
+        ttk.Button(upload_frame, text="Upload Named Template", 
+                  command=self.upload_named_template).pack(fill=tk.X, pady=2)
         ttk.Button(upload_frame, text="Upload Default", 
                   command=self.upload_default).pack(fill=tk.X, pady=2)
-        ttk.Button(upload_frame, text="Upload Data", 
-                  command=self.upload_data).pack(fill=tk.X, pady=2)
+        self.upload_data_button = ttk.Button(upload_frame, text="Upload Data", 
+                                             command=self.upload_data)
+        self.upload_data_button.pack(fill=tk.X, pady=2)
+        self.import_progress = ttk.Progressbar(upload_frame, maximum=1.0)
+        self.import_progress.pack(fill=tk.X, pady=2)
+        
+        # Preview person section
+        person_frame = ttk.LabelFrame(left_frame, text="Preview Person", padding=10)
+        person_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.person_search_var = tk.StringVar()
+        self.person_search_var.trace('w', self.on_person_search)
+        ttk.Entry(person_frame, textvariable=self.person_search_var).pack(fill=tk.X, pady=(0, 5))
+        
+        self.person_list = VirtualListView(person_frame, height=5, on_select=self.on_person_select)
+        self.person_list.pack(fill=tk.X)
+        self.update_person_list()
+        ttk.Button(person_frame, text="Show Grid",
+                   command=self.show_thumbnail_grid).pack(fill=tk.X, pady=(5, 0))
         
         # Render items section
         render_frame = ttk.LabelFrame(left_frame, text="Render Items", padding=10)
@@ -349,8 +753,7 @@ class BirthdayBackgroundEditor:
         self.info_var = tk.StringVar()
         self.info_var.trace('w', self.on_edit_change)
         self.info_combo = ttk.Combobox(edit_frame, textvariable=self.info_var)
-        if self.data:
-            self.info_combo['values'] = list(self.data[0].keys())
+        self.info_combo['values'] = self.get_info_fields()
         self.info_combo.pack(fill=tk.X, pady=(0, 10))
         
         # Font size
@@ -380,6 +783,28 @@ class BirthdayBackgroundEditor:
         
         ttk.Button(color_frame, text="Choose", command=self.choose_color).pack(side=tk.LEFT)
         
+        # Text effects, drawn under the text
+        ttk.Label(edit_frame, text="Effects:").pack(anchor=tk.W, pady=(0, 5))
+        effects_frame = ttk.Frame(edit_frame)
+        effects_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.effect_vars = {}
+        for row, (kind, fields) in enumerate(EFFECT_FIELDS):
+            enabled_var = tk.BooleanVar()
+            ttk.Checkbutton(effects_frame, text=kind.capitalize(),
+                            variable=enabled_var).grid(row=row, column=0, sticky=tk.W)
+            self.effect_vars[(kind, 'enabled')] = enabled_var
+            for column, (field, label) in enumerate(fields):
+                ttk.Label(effects_frame, text=label).grid(row=row, column=1 + column * 2,
+                                                          sticky=tk.E, padx=(5, 2))
+                field_var = tk.StringVar()
+                width = 8 if field == 'color' else 4
+                ttk.Entry(effects_frame, textvariable=field_var,
+                          width=width).grid(row=row, column=2 + column * 2, sticky=tk.W)
+                self.effect_vars[(kind, field)] = field_var
+        for var in self.effect_vars.values():
+            var.trace('w', self.on_edit_change)
+        
         # # Save button
         # ttk.Button(edit_frame, text="Save Changes", command=self.save_current_item).pack(fill=tk.X, pady=10)
         
@@ -391,21 +816,53 @@ class BirthdayBackgroundEditor:
         self.canvas = tk.Canvas(preview_frame, bg='white', width=800, height=600)
         self.canvas.pack(fill=tk.BOTH, expand=True)
         
+        # Drag render items directly on the preview
+        self.canvas.bind('<ButtonPress-1>', self.on_canvas_press)
+        self.canvas.bind('<B1-Motion>', self.on_canvas_drag)
+        self.canvas.bind('<ButtonRelease-1>', self.on_canvas_release)
+        
         # Update render items list
         self.update_render_list()
         self.clear_edit_fields()
     
+    def person_label(self, index):
+        """Label of a roster row in the person list"""
+        person = self.data[index]
+        return f"{person.get('name', '')}  ({person.get('birthday', '')})"
+    
+    def update_person_list(self):
+        """Show roster rows matching the search text"""
+        matches = self.roster_index.search(self.person_search_var.get())
+        self.person_list.set_items(matches, self.person_label)
+    
+    def show_thumbnail_grid(self):
+        """Open (or raise) the thumbnail grid of the matching people"""
+        if self.thumbnail_grid is None:
+            self.thumbnail_grid = ThumbnailGrid(self)
+        else:
+            self.thumbnail_grid.lift()
+            self.thumbnail_grid.request_refresh()
+    
+    def on_person_search(self, *args):
+        """Handle search-as-you-type in the person list"""
+        self.update_person_list()
+    
+    def on_person_select(self, index):
+        """Preview the selected person"""
+        self.preview_person_index = index
+        self.refresh_preview()
+    
     def on_edit_change(self, *args):
         """Handle real-time edit changes"""
         if self.current_item_index >= 0:
             # Update preview in real-time
-            self.root.after_idle(self.refresh_preview)
+            self.request_preview()
             self.save_current_item()
     
     def get_current_edit_values(self):
         """Get current values from edit fields"""
         try:
-            return {
+            values = {
                 'pos': {
                     'x': int(self.x_var.get() or 0),
                     'y': int(self.y_var.get() or 0)
@@ -417,9 +874,38 @@ class BirthdayBackgroundEditor:
                     'color': self.color_var.get() or 'ffffff'
                 }
             }
+            effects = self.get_edit_effects()
+            if effects:
+                values['effects'] = effects
+            return values
         except ValueError:
             return None
     
+    def get_edit_effects(self):
+        """Get the effects section from the effect fields, raises ValueError on bad numbers"""
+        current_effects = {}
+        if 0 <= self.current_item_index < len(self.config.get('render', [])):
+            current_effects = self.config['render'][self.current_item_index].get('effects') or {}
+        
+        effects = {}
+        for kind, fields in EFFECT_FIELDS:
+            if not self.effect_vars[(kind, 'enabled')].get():
+                continue
+            # Keep settings without a field, like opacity
+            effect = dict(current_effects.get(kind) or {})
+            for field, _ in fields:
+                value = self.effect_vars[(kind, field)].get().strip()
+                if not value:
+                    continue
+                if field == 'color':
+                    effect[field] = value.lstrip('#')
+                elif field in ('x', 'y'):
+                    effect['offset'] = {**(effect.get('offset') or {}), field: int(value)}
+                else:
+                    effect[field] = int(value)
+            effects[kind] = effect
+        return effects
+    
     def upload_template(self):
         """Upload template image"""
         file_path = filedialog.askopenfilename(
@@ -427,19 +913,44 @@ class BirthdayBackgroundEditor:
             filetypes=[("Image files", "*.png *.jpg *.jpeg *.bmp *.gif")]
         )
         if file_path:
-            try:
-                # Read the image file and encrypt it
-                with open(file_path, 'rb') as f:
-                    image_data = f.read()
-                
-                success = save_encrypted_binary_file('bgs/template.png', image_data)
-                if success:
-                    messagebox.showinfo("Success", "Template uploaded and encrypted successfully!")
-                    self.refresh_preview()
-                else:
-                    messagebox.showerror("Error", "Failed to encrypt and save template")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to upload template: {e}")
+            self.save_template(file_path, DEFAULT_TEMPLATE)
+    
+    def upload_named_template(self):
+        """Upload a template picked by a 'template' column or a templates.rules entry"""
+        file_path = filedialog.askopenfilename(
+            title="Select Template Image",
+            filetypes=[("Image files", "*.png *.jpg *.jpeg *.bmp *.gif")]
+        )
+        if not file_path:
+            return
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        template_path = simpledialog.askstring(
+            "Template Name", "Path used in the 'template' column or templates.rules:",
+            initialvalue=f"bgs/{name}.png", parent=self.root)
+        if template_path and template_path.strip():
+            self.save_template(file_path, template_path.strip().replace('\\', '/'))
+    
+    def save_template(self, file_path, template_path):
+        """Encrypt an image file as template_path and build its preview pyramid"""
+        try:
+            # Read the image file and encrypt it
+            with open(file_path, 'rb') as f:
+                image_data = f.read()
+            
+            self.watcher.watch(template_path)
+            with self.watcher.suppress(template_path):
+                success = save_encrypted_binary_file(template_path, image_data)
+            if success:
+                # Precompute downscaled levels for the preview
+                save_template_pyramid(template_path)
+                messagebox.showinfo("Success", f"Template {template_path} uploaded and encrypted successfully!")
+                self.refresh_preview()
+                if self.thumbnail_grid is not None:
+                    self.thumbnail_grid.request_refresh()
+            else:
+                messagebox.showerror("Error", "Failed to encrypt and save template")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to upload template: {e}")
     
     def upload_default(self):
         """Upload default image"""
@@ -453,7 +964,8 @@ class BirthdayBackgroundEditor:
                 with open(file_path, 'rb') as f:
                     image_data = f.read()
                 
-                success = save_encrypted_binary_file('bgs/default.png', image_data)
+                with self.watcher.suppress('bgs/default.png'):
+                    success = save_encrypted_binary_file('bgs/default.png', image_data)
                 if success:
                     messagebox.showinfo("Success", "Default image uploaded and encrypted successfully!")
                 else:
@@ -468,29 +980,51 @@ class BirthdayBackgroundEditor:
             filetypes=[("CSV files", "*.csv"), ("Excel files", "*.xlsx")]
         )
         if file_path:
-            try:
-                if file_path.endswith('.xlsx'):
-                    # Convert XLSX to CSV string
-                    df = pd.read_excel(file_path)
-                    csv_content = df.to_csv(index=False)
-                else:
-                    # Read CSV file content
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        csv_content = f.read()
-                
-                # Encrypt and save CSV content
-                success = save_encrypted_text_file('data.csv', csv_content)
-                if success:
-                    # Reload data
-                    self.data = self.load_data()
+            # Import in a worker so the editor stays responsive on large rosters
+            self.upload_data_button.state(['disabled'])
+            self.import_progress['value'] = 0
+            self.import_queue = queue.Queue()
+            
+            def worker():
+                try:
+                    people = import_roster(
+                        file_path, progress=lambda f: self.import_queue.put(('progress', f)),
+                        suppress=self.watcher.suppress)
+                    self.import_queue.put(('done', (people, RosterIndex(people))))
+                except Exception as e:
+                    self.import_queue.put(('error', e))
+            
+            threading.Thread(target=worker, daemon=True).start()
+            self.root.after(50, self.poll_import)
+    
+    def poll_import(self):
+        """Apply progress and result messages from the import worker"""
+        try:
+            while True:
+                kind, value = self.import_queue.get_nowait()
+                if kind == 'progress':
+                    self.import_progress['value'] = value
+                elif kind == 'done':
+                    self.upload_data_button.state(['!disabled'])
+                    self.import_progress['value'] = 1.0
+                    # The roster was built during the import, no need to decrypt it again
+                    self.data, self.roster_index = value
+                    self.watch_templates()
                     if self.data:
-                        self.info_combo['values'] = list(self.data[0].keys())
+                        self.info_combo['values'] = self.get_info_fields()
+                    self.preview_person_index = 0
+                    self.update_person_list()
                     messagebox.showinfo("Success", "Data uploaded and encrypted successfully!")
                     self.refresh_preview()
+                    return
                 else:
-                    messagebox.showerror("Error", "Failed to encrypt and save data file")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to upload data: {e}")
+                    self.upload_data_button.state(['!disabled'])
+                    self.import_progress['value'] = 0
+                    messagebox.showerror("Error", f"Failed to upload data: {value}")
+                    return
+        except queue.Empty:
+            pass
+        self.root.after(50, self.poll_import)
     
     def update_render_list(self):
         """Update the render items listbox"""
@@ -523,6 +1057,8 @@ class BirthdayBackgroundEditor:
             self.size_var.trace_vdelete('w', self.size_var.trace_info()[0][1])
             self.font_var.trace_vdelete('w', self.font_var.trace_info()[0][1])
             self.color_var.trace_vdelete('w', self.color_var.trace_info()[0][1])
+            for var in self.effect_vars.values():
+                var.trace_vdelete('w', var.trace_info()[0][1])
             
             # Set values
             self.x_var.set(str(item['pos']['x']))
@@ -531,6 +1067,15 @@ class BirthdayBackgroundEditor:
             self.size_var.set(str(item['font']['size']))
             self.font_var.set(item['font']['family'])
             self.color_var.set(item['font']['color'])
+            effects = item.get('effects') or {}
+            for kind, fields in EFFECT_FIELDS:
+                effect = effects.get(kind)
+                self.effect_vars[(kind, 'enabled')].set(isinstance(effect, dict))
+                effect = {**EFFECT_DEFAULTS[kind], **(effect if isinstance(effect, dict) else {})}
+                offset = {**EFFECT_DEFAULTS[kind].get('offset', {}), **(effect.get('offset') or {})}
+                for field, _ in fields:
+                    value = offset.get(field) if field in ('x', 'y') else effect.get(field)
+                    self.effect_vars[(kind, field)].set(str(value))
             
             # Re-enable trace
             self.x_var.trace('w', self.on_edit_change)
@@ -539,6 +1084,8 @@ class BirthdayBackgroundEditor:
             self.size_var.trace('w', self.on_edit_change)
             self.font_var.trace('w', self.on_edit_change)
             self.color_var.trace('w', self.on_edit_change)
+            for var in self.effect_vars.values():
+                var.trace('w', self.on_edit_change)
     
     def clear_edit_fields(self):
         """Clear all edit fields"""
@@ -548,6 +1095,8 @@ class BirthdayBackgroundEditor:
         self.size_var.set("")
         self.font_var.set("")
         self.color_var.set("")
+        for (kind, field), var in self.effect_vars.items():
+            var.set(False if field == 'enabled' else "")
     
     def add_render_item(self):
         """Add new render item"""
@@ -597,7 +1146,6 @@ class BirthdayBackgroundEditor:
                 self.update_render_list()
                 # Reselect the item
                 self.render_listbox.selection_set(self.current_item_index)
-                self.refresh_preview()
                 # messagebox.showinfo("Success", "Item saved successfully!")
     
     def choose_color(self):
@@ -606,43 +1154,150 @@ class BirthdayBackgroundEditor:
         if color[1]:
             self.color_var.set(color[1].lstrip('#'))
     
-    def hex_to_rgb(self, hex_color):
-        """Convert hex color to RGB tuple"""
-        hex_color = hex_color.lstrip('#')
-        return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+    def get_preview_template(self):
+        """Get the template path used by the preview person"""
+        if self.data and 0 <= self.preview_person_index < len(self.data):
+            return get_person_template(self.data[self.preview_person_index], self.config)
+        return DEFAULT_TEMPLATE
+    
+    def get_preview_base(self, canvas_width, canvas_height, draft=False):
+        """Get (scale, template scaled to fit canvas), None if there is no template
+
+        Draft bases trade quality for speed, see render_engine.ScaledTemplateCache.
+        """
+        base = scaled_templates.get(self.get_preview_template(), (canvas_width, canvas_height), draft)
+        if base is None:
+            return None
+        return base[0], base[1]
+    
+    def request_preview(self):
+        """Draft-render the preview while the user interacts, full quality once idle"""
+        if self.draft_job is None:
+            self.draft_job = self.root.after_idle(self.on_preview_draft)
+        if self.idle_render_job is not None:
+            self.root.after_cancel(self.idle_render_job)
+        self.idle_render_job = self.root.after(PREVIEW_IDLE_DELAY, self.on_preview_idle)
+    
+    def on_preview_draft(self):
+        """Render the coalesced draft preview"""
+        self.draft_job = None
+        self.refresh_preview(draft=True)
+    
+    def on_preview_idle(self):
+        """Replace the draft preview with the full quality render"""
+        self.idle_render_job = None
+        self.refresh_preview()
+    
+    def on_canvas_press(self, event):
+        """Start dragging the topmost render item under the cursor"""
+        for item in reversed(self.preview_items):
+            x0, y0, x1, y1 = item['bbox']
+            if x0 <= event.x <= x1 and y0 <= event.y <= y1:
+                break
+        else:
+            return
+        
+        index = item['index']
+        self.current_item_index = index
+        self.render_listbox.selection_clear(0, tk.END)
+        self.render_listbox.selection_set(index)
+        self.load_item_to_edit(index)
+        
+        # Lightweight overlay: the cached text mask, colored, as a canvas image
+        mask, _ = text_sprites.get_sprite(item['text'], item['family'], item['size'])
+        if mask is None:
+            return
+        sprite = Image.new('RGBA', mask.size, item['color'] + (0,))
+        sprite.putalpha(mask)
+        self.drag = {
+            'index': index,
+            'origin': (event.x, event.y),
+            'start': (event.x, event.y),
+            'scale': item['scale'],
+            'photo': ImageTk.PhotoImage(sprite),
+            'items': [],
+        }
+        
+        # One render of the template without the dragged item
+        self.refresh_preview()
+        x0, y0, x1, y1 = item['bbox']
+        self.drag['items'] = [
+            self.canvas.create_image(x0, y0, anchor=tk.NW, image=self.drag['photo']),
+            self.canvas.create_rectangle(x0, y0, x1, y1, outline='red', width=2),
+        ]
+    
+    def on_canvas_drag(self, event):
+        """Move the drag overlay, no PIL rendering"""
+        if not self.drag:
+            return
+        dx = event.x - self.drag['start'][0]
+        dy = event.y - self.drag['start'][1]
+        self.drag['start'] = (event.x, event.y)
+        for canvas_item in self.drag['items']:
+            self.canvas.move(canvas_item, dx, dy)
+    
+    def on_canvas_release(self, event):
+        """Apply the dragged position: one config save and one full render"""
+        if not self.drag:
+            return
+        drag, self.drag = self.drag, None
+        for canvas_item in drag['items']:
+            self.canvas.delete(canvas_item)
+        
+        # Canvas displacement converted back to template pixels
+        dx = round((event.x - drag['origin'][0]) / drag['scale'])
+        dy = round((event.y - drag['origin'][1]) / drag['scale'])
+        if dx or dy:
+            item = self.config['render'][drag['index']]
+            pos = item.setdefault('pos', {})
+            pos['x'] = int(pos.get('x', 0)) + dx
+            pos['y'] = int(pos.get('y', 0)) + dy
+            self.load_item_to_edit(drag['index'])
+            self.save_config()
+            self.update_render_list()
+            self.render_listbox.selection_set(drag['index'])
+        self.refresh_preview()
+    
+    def show_preview_message(self, text, size):
+        """Replace the preview with a red message"""
+        self.canvas.delete("all")
+        self.preview_item = None
+        self.canvas.create_text(400, 300, text=text, font=("Arial", size), fill="red")
     
-    def refresh_preview(self):
+    def refresh_preview(self, draft=False):
         """Refresh the preview canvas"""
         try:
-            # Load encrypted template image
-            template_data = load_encrypted_binary_file("bgs/template.png")
-            if template_data is None:
-                self.canvas.delete("all")
-                self.canvas.create_text(400, 300, text="No template image found",
-                                      font=("Arial", 16), fill="red")
-                return
-            
-            # Open and resize image for preview
-            image = Image.open(BytesIO(template_data))
-            
             # Calculate scaling to fit canvas
             canvas_width = self.canvas.winfo_width() or 800
             canvas_height = self.canvas.winfo_height() or 600
             
-            img_width, img_height = image.size
-            scale_x = canvas_width / img_width
-            scale_y = canvas_height / img_height
-            scale = min(scale_x, scale_y, 1.0)  # Don't scale up
+            # Scaled template, cached until the template or canvas size changes
+            preview_base = self.get_preview_base(canvas_width, canvas_height, draft)
+            if preview_base is None:
+                self.show_preview_message("No template image found", 16)
+                return
             
-            new_width = int(img_width * scale)
-            new_height = int(img_height * scale)
+            scale, base = preview_base
+            new_width, new_height = base.size
             
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            draw = ImageDraw.Draw(image)
+            # Reuse the render buffer while the preview size is unchanged
+            if (self.render_buffer is None or self.render_buffer.size != base.size
+                    or self.render_buffer.mode != base.mode):
+                self.render_buffer = base.copy()
+            else:
+                self.render_buffer.paste(base)
+            image = self.render_buffer
+            
+            # Center the image
+            x_offset = (canvas_width - new_width) // 2
+            y_offset = (canvas_height - new_height) // 2
+            self.preview_items = []
             
             # Render text from config and current edit
             if self.data:
-                person = self.data[0]  # Use first person for preview
+                if not 0 <= self.preview_person_index < len(self.data):
+                    self.preview_person_index = 0
+                person = self.data[self.preview_person_index]
                 
                 render_items = self.config.get('render', []).copy()
                 
@@ -652,54 +1307,34 @@ class BirthdayBackgroundEditor:
                     if current_values:
                         render_items[self.current_item_index] = current_values
                 
-                for i, render_item in enumerate(render_items):
-                    pos = render_item.get('pos', {})
-                    x = int(pos.get('x', 0) * scale)
-                    y = int(pos.get('y', 0) * scale)
-                    
-                    info_field = render_item.get('info', '')
-                    text = person.get(info_field, f'[{info_field}]')
-                    
-                    font_config = render_item.get('font', {})
-                    font_size = int(font_config.get('size', 50) * scale)
-                    font_family = font_config.get('family', 'arial.ttf')
-                    font_color = font_config.get('color', 'ffffff')
-                    
-                    # Load font
-                    try:
-                        font = ImageFont.truetype(font_family, font_size)
-                    except:
-                        font = ImageFont.load_default()
-                    
-                    # Convert color
-                    try:
-                        color = self.hex_to_rgb(font_color)
-                    except:
-                        color = (255, 255, 255)
-                    
-                    # Highlight current item being edited
-                    if i == self.current_item_index:
-                        # Draw a border around current item
-                        bbox = draw.textbbox((x, y), text, font=font)
+                def highlight(draw, index, bbox):
+                    # Draw a border around current item
+                    if index == self.current_item_index:
                         draw.rectangle(bbox, outline=(255, 0, 0), width=2)
-                    
-                    # Draw text
-                    draw.text((x, y), text, font=font, fill=color)
-            
-            # Convert to PhotoImage and display
-            self.preview_image = ImageTk.PhotoImage(image)
-            self.canvas.delete("all")
-            
-            # Center the image
-            x_offset = (canvas_width - new_width) // 2
-            y_offset = (canvas_height - new_height) // 2
+                
+                # The dragged item is shown as a canvas overlay instead;
+                # draft renders use coarser font sizes that keep hitting the sprite cache
+                self.preview_items = render_person(
+                    image, compile_render_plan(render_items), person, scale,
+                    offset=(x_offset, y_offset),
+                    missing=lambda info_field: f'[{info_field}]',
+                    size_step=DRAFT_FONT_STEP if draft else 1,
+                    highlight=highlight,
+                    hidden=(self.drag['index'],) if self.drag else ())
             
-            self.canvas.create_image(x_offset, y_offset, anchor=tk.NW, image=self.preview_image)
+            # Update the existing PhotoImage in place when the size is unchanged
+            if (self.preview_item is not None and self.preview_image is not None
+                    and (self.preview_image.width(), self.preview_image.height()) == image.size):
+                self.preview_image.paste(image)
+                self.canvas.coords(self.preview_item, x_offset, y_offset)
+            else:
+                self.preview_image = ImageTk.PhotoImage(image)
+                self.canvas.delete("all")
+                self.preview_item = self.canvas.create_image(x_offset, y_offset, anchor=tk.NW,
+                                                             image=self.preview_image)
             
         except Exception as e:
-            self.canvas.delete("all")
-            self.canvas.create_text(400, 300, text=f"Preview error: {str(e)}", 
-                                  font=("Arial", 12), fill="red")
+            self.show_preview_message(f"Preview error: {str(e)}", 12)
 
 def main():
     # Show password dialog first - use mode=1 for blind input mode
@@ -712,9 +1347,9 @@ def main():
     root = tk.Tk()
     app = BirthdayBackgroundEditor(root)
     
-    # Bind canvas resize to refresh preview
+    # Bind canvas resize to refresh preview (draft while resizing)
     def on_canvas_configure(event):
-        app.refresh_preview()
+        app.request_preview()
     
     app.canvas.bind('<Configure>', on_canvas_configure)
     
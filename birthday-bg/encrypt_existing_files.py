@@ -2,11 +2,32 @@
 Script to encrypt existing files and convert them to hash-based filenames
 """
 
+import csv
 import os
 import shutil
+import yaml
 from crypto_utils import (save_encrypted_text_file, save_encrypted_binary_file, 
                          get_encrypted_path, get_file_hash)
 
+def get_named_templates():
+    """Get the templates named by data.csv's template column and config.yaml's rules"""
+    from render_engine import get_template_paths
+    
+    config = {}
+    people = []
+    try:
+        with open('config.yaml', 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        print(f"  ⚠ Could not read config.yaml for templates: {e}")
+    try:
+        with open('data.csv', 'r', encoding='utf-8') as f:
+            people = [{key.strip(): (value or '').strip() for key, value in row.items() if key}
+                      for row in csv.DictReader(f)]
+    except OSError as e:
+        print(f"  ⚠ Could not read data.csv for templates: {e}")
+    return [path for path in get_template_paths(config, people) if path != 'bgs/template.png']
+
 def encrypt_existing_files():
     """Encrypt all existing resource files"""
     
@@ -17,6 +38,8 @@ def encrypt_existing_files():
         ('bgs/template.png', 'binary'),
         ('bgs/default.png', 'binary')
     ]
+    # Plus the per-person templates the roster and config point at
+    files_to_encrypt += [(path, 'binary') for path in get_named_templates()]
     
     print("Starting file encryption process...")
     
@@ -1,18 +1,53 @@
 import csv
-import yaml
+import hashlib
 import os
 import sys
 from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
-import ctypes
-from ctypes import wintypes
-from crypto_utils import load_encrypted_text_file, load_encrypted_binary_file
+from crypto_utils import (load_encrypted_text_file,
+                          get_cached_decrypted_file, get_encrypted_file_signature,
+                          get_file_checksum)
+from birthdays import is_birthday
+from wallpaper import get_wallpaper_backend, load_wallpaper_state, save_wallpaper_state
 from io import StringIO, BytesIO
 
-basepath = "D:/birthday-bg/"
+# yaml, PIL, render_engine and urllib are imported where they are used, so the
+# default-wallpaper path (almost every login) doesn't pay for them at startup
 
-def read_csv_data(csv_path):
+basepath = os.environ.get("BIRTHDAY_BG_BASEPATH", "D:/birthday-bg/")
+
+# Output encoders for the rendered wallpaper, selected by config['output']['format']
+OUTPUT_FORMATS = {
+    'bmp': {'format': 'BMP', 'extension': '.bmp'},
+    'png': {'format': 'PNG', 'extension': '.png'},
+    'jpeg': {'format': 'JPEG', 'extension': '.jpg'},
+}
+DEFAULT_OUTPUT_FORMAT = 'bmp'
+
+# Content types served by render_service.py and the file extensions they are saved with
+CONTENT_TYPE_EXTENSIONS = {
+    'image/bmp': '.bmp',
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+}
+# Seconds to wait for the render service
+SERVER_TIMEOUT = 5
+# Threads loading config, template and fonts on birthdays
+LOAD_WORKERS = 3
+
+# Reused between saves so batch renders don't reallocate a full-size buffer each time
+_encode_buffer = BytesIO()
+
+def resolve_basepath(path=None):
+    """Get the asset directory: path if given, else the module's basepath
+
+    Functions that render take a basepath so a render service can work on
+    its own asset directory in the same process as a client.
+    """
+    return basepath if path is None else path
+
+def read_csv_data(csv_path, basepath=None):
     """Read birthday data from encrypted CSV file"""
+    basepath = resolve_basepath(basepath)
     people = []
     print(csv_path)
     try:
@@ -36,8 +71,9 @@ def read_csv_data(csv_path):
         return []
     return people
 
-def read_config(config_path):
+def read_config(config_path, basepath=None):
     """Read configuration from encrypted YAML file"""
+    basepath = resolve_basepath(basepath)
     try:
         # Load encrypted YAML content
         yaml_content = load_encrypted_text_file(config_path, basepath)
@@ -46,6 +82,7 @@ def read_config(config_path):
             return None
         
         # Parse YAML from string
+        import yaml
         config = yaml.safe_load(yaml_content)
         return config
     except Exception as e:
@@ -53,122 +90,179 @@ def read_config(config_path):
         return None
 
 def check_birthday_today(people):
-    """Check if anyone has a birthday today"""
-    today = datetime.now()
-    today_str = f"{today.month}.{today.day}"
+    """Check if anyone has a birthday today ("month.day" or "year.month.day")"""
+    today = datetime.now().date()
     
     birthday_people = []
     for person in people:
-        if person.get('birthday') == today_str:
+        if is_birthday(person, today):
             birthday_people.append(person)
     
     return birthday_people
 
-def hex_to_rgb(hex_color):
-    """Convert hex color to RGB tuple"""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+def get_output_settings(config):
+    """Get output format name and encoder parameters from config"""
+    output_config = (config or {}).get('output', {}) or {}
+    format_name = str(output_config.get('format', DEFAULT_OUTPUT_FORMAT)).lower()
+    if format_name == 'jpg':
+        format_name = 'jpeg'
+    if format_name not in OUTPUT_FORMATS:
+        print(f"Unknown output format '{format_name}', using {DEFAULT_OUTPUT_FORMAT}")
+        format_name = DEFAULT_OUTPUT_FORMAT
+    
+    params = {}
+    if format_name == 'png':
+        params['compress_level'] = int(output_config.get('png_compress_level', 1))
+    elif format_name == 'jpeg':
+        params['quality'] = int(output_config.get('jpeg_quality', 90))
+    return format_name, params
+
+def get_output_path(config, directory):
+    """Get path of the rendered wallpaper for the configured output format"""
+    format_name, _ = get_output_settings(config)
+    return os.path.join(directory, 'birthday_rendered' + OUTPUT_FORMATS[format_name]['extension'])
 
-def render_birthday_image(template_path, config, person, output_path):
+def save_rendered_image(image, output_path, config):
+    """Encode image with the configured output format and write it in one go"""
+    format_name, params = get_output_settings(config)
+    if image.mode not in ('RGB', 'L'):
+        # BMP and JPEG have no use for alpha on a wallpaper
+        image = image.convert('RGB')
+    
+    _encode_buffer.seek(0)
+    image.save(_encode_buffer, format=OUTPUT_FORMATS[format_name]['format'], **params)
+    size = _encode_buffer.tell()
+    with _encode_buffer.getbuffer() as buffer:
+        with open(output_path, 'wb') as f:
+            f.write(buffer[:size])
+
+def render_birthday_image(template_path, config, person, output_path, basepath=None):
     """Render birthday image with person's information"""
+    basepath = resolve_basepath(basepath)
     try:
-        # Load encrypted template image
-        template_data = load_encrypted_binary_file(template_path, basepath)
-        if template_data is None:
+        from render_engine import render_person_image
+        
+        # Decoded template and compiled render plan are cached by render_engine
+        image = render_person_image(template_path, config, person, basepath)
+        if image is None:
             print(f"Error: Could not load encrypted template: {template_path}")
             return False
         
-        # Open image from bytes
-        image = Image.open(BytesIO(template_data))
-        draw = ImageDraw.Draw(image)
-        
-        # Process each render item from config
-        for render_item in config.get('render', []):
-            pos = render_item.get('pos', {})
-            x = pos.get('x', 0)
-            y = pos.get('y', 0)
-            
-            info_field = render_item.get('info', '')
-            text = person.get(info_field, '')
-            
-            font_config = render_item.get('font', {})
-            font_size = font_config.get('size', 50)
-            font_family = font_config.get('family', 'arial.ttf')
-            font_color = font_config.get('color', 'ffffff')
-            
-            # Load font
-            try:
-                font = ImageFont.truetype(font_family, font_size)
-            except:
-                # Fallback to default font
-                font = ImageFont.load_default()
-            
-            # Convert color
-            color = hex_to_rgb(font_color)
-            
-            # Draw text
-            draw.text((x, y), text, font=font, fill=color)
-        
         # Save rendered image
-        image.save(output_path)
+        save_rendered_image(image, output_path, config)
         return True
         
     except Exception as e:
         print(f"Error rendering image: {e}")
         return False
 
-def set_wallpaper(image_path):
-    """Set desktop wallpaper using Windows API"""
-    try:
-        # Convert to absolute path
-        abs_path = os.path.abspath(image_path)
-        
-        # Define constants
-        SPI_SETDESKWALLPAPER = 20
-        SPIF_UPDATEINIFILE = 0x01
-        SPIF_SENDCHANGE = 0x02
-        
-        # Set wallpaper
-        result = ctypes.windll.user32.SystemParametersInfoW(
-            SPI_SETDESKWALLPAPER,
-            0,
-            abs_path,
-            SPIF_UPDATEINIFILE | SPIF_SENDCHANGE
-        )
-        
-        return result != 0
-        
-    except Exception as e:
-        print(f"Error setting wallpaper: {e}")
-        return False
+def set_wallpaper(image_path, backend=None):
+    """Set desktop wallpaper using the given (or platform default) backend"""
+    if backend is None:
+        backend = get_wallpaper_backend()
+    return backend.set_wallpaper(image_path)
 
-def main():
-    """Main program execution"""
-    # Define paths (using original names for crypto_utils)
-    csv_path = 'data.csv'  # crypto_utils will handle the encrypted path
-    config_path = 'config.yaml'  # crypto_utils will handle the encrypted path
-    template_path = 'bgs/template.png'  # crypto_utils will handle the encrypted path
-    default_path = 'bgs/default.png'  # crypto_utils will handle the encrypted path
-    rendered_path = os.path.join(basepath, 'bgs', 'birthday_rendered.png')
-    
-    # Read data and config
-    people = read_csv_data(csv_path)
-    config = read_config(config_path)
-    
-    if not people or not config:
-        print("Failed to load data or config")
-        sys.exit(1)
+# Paths of the encrypted inputs (crypto_utils will handle the encrypted path)
+csv_path = 'data.csv'
+config_path = 'config.yaml'
+template_path = 'bgs/template.png'
+default_path = 'bgs/default.png'
+
+def get_inputs_signature(extra_paths=(), basepath=None):
+    """Get size/mtime of all encrypted inputs, used to detect changes
+
+    extra_paths are inputs only known after reading data and config, such as
+    per-person templates.
+    """
+    basepath = resolve_basepath(basepath)
+    return [get_encrypted_file_signature(path, basepath)
+            for path in (csv_path, config_path, template_path, default_path, *extra_paths)]
+
+def render_batch(people, config, output_dir):
+    """Render every person of a roster into output_dir, return the output paths
+
+    Templates are decoded once each through render_engine.template_cache.
+    """
+    from render_engine import get_person_template
+    
+    os.makedirs(output_dir, exist_ok=True)
+    extension = OUTPUT_FORMATS[get_output_settings(config)[0]]['extension']
+    paths = []
+    for i, person in enumerate(people):
+        output_path = os.path.join(output_dir, f"{i:05d}{extension}")
+        person_template = get_person_template(person, config, template_path)
+        if render_birthday_image(person_template, config, person, output_path):
+            paths.append(output_path)
+    return paths
+
+def preload_template(person, basepath=None):
+    """Decode the template the person picks without the config, return its path
+
+    The config may still pick another one through its rules, which is then
+    decoded by the render itself.
+    """
+    basepath = resolve_basepath(basepath)
+    from render_engine import get_person_template, template_cache
+    guessed_path = get_person_template(person, None, template_path)
+    template_cache.get(guessed_path, basepath)
+    return guessed_path
+
+def preload_fonts(config, person):
+    """Load fonts and rasterize the person's text for the configured render items"""
+    from render_engine import compile_render_plan, warm_render_plan
+    warm_render_plan(compile_render_plan(config.get('render', [])), person)
+
+def prepare_wallpaper(basepath=None):
+    """Render today's wallpaper or get the cached default
+
+    Returns (wallpaper path or None on failure, extra input paths it depends on).
+    """
+    basepath = resolve_basepath(basepath)
+    
+    # Read data
+    people = read_csv_data(csv_path, basepath)
+    
+    if not people:
+        print("Failed to load data")
+        return None, []
     
     # Check for birthdays today
     birthday_people = check_birthday_today(people)
     
     wallpaper_path = default_path
+    extra_paths = []
     
     if birthday_people:
         # Someone has a birthday today - render template
         person = birthday_people[0]  # Use first person if multiple birthdays
         
-        if render_birthday_image(template_path, config, person, rendered_path):
+        # The config, template and fonts are only needed to render; load them
+        # concurrently (decryption, zlib and PIL decoding release the GIL)
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(LOAD_WORKERS) as pool:
+            config_future = pool.submit(read_config, config_path, basepath)
+            template_future = pool.submit(preload_template, person, basepath)
+            
+            config = config_future.result()
+            if not config:
+                print("Failed to load config")
+                return None, []
+            fonts_future = pool.submit(preload_fonts, config, person)
+            
+            from render_engine import get_person_template
+            person_template = get_person_template(person, config, template_path)
+            if person_template != template_path:
+                extra_paths.append(person_template)
+            
+            # Render as soon as both the template and the text sprites are ready
+            for future in (template_future, fonts_future):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error preloading render inputs: {e}")
+        
+        rendered_path = get_output_path(config, os.path.join(basepath, 'bgs'))
+        if render_birthday_image(person_template, config, person, rendered_path, basepath):
             wallpaper_path = rendered_path
         else:
             # Fallback to default if rendering fails
@@ -176,29 +270,118 @@ def main():
     
     # Handle wallpaper setting
     if wallpaper_path == default_path:
-        # For default image, check if encrypted version exists
-        default_data = load_encrypted_binary_file(default_path, basepath)
-        if default_data:
-            # Save decrypted default image temporarily
-            temp_default_path = os.path.join(basepath, 'bgs', 'temp_default.png')
-            with open(temp_default_path, 'wb') as f:
-                f.write(default_data)
-            wallpaper_path = temp_default_path
+        # Use the persistent decrypted copy, only refreshed when the encrypted default changes
+        default_cache_path = os.path.join(basepath, 'bgs', 'default_cache.png')
+        cached_default_path = get_cached_decrypted_file(default_path, default_cache_path, basepath)
+        if cached_default_path:
+            wallpaper_path = cached_default_path
+    
+    return wallpaper_path, extra_paths
+
+def fetch_wallpaper(server_url, cache_dir):
+    """Fetch the current wallpaper from a render service, return the local path
+
+    The last response is kept in cache_dir with its ETag and only downloaded
+    again when the server reports a change. If the server can't be reached,
+    the last downloaded wallpaper is used.
+    """
+    from urllib.error import HTTPError, URLError
+    from urllib.request import Request, urlopen
+    
+    meta_path = os.path.join(cache_dir, 'server_wallpaper.json')
+    meta = load_wallpaper_state(meta_path)
+    cached_path = meta.get('path')
+    if cached_path and not os.path.exists(cached_path):
+        cached_path = None
+    
+    request = Request(server_url.rstrip('/') + '/wallpaper')
+    if cached_path and meta.get('etag'):
+        request.add_header('If-None-Match', meta['etag'])
+    
+    try:
+        with urlopen(request, timeout=SERVER_TIMEOUT) as response:
+            data = response.read()
+            etag = response.headers.get('ETag')
+            checksum = response.headers.get('X-Checksum')
+            content_type = response.headers.get('Content-Type', '')
+    except HTTPError as e:
+        if e.code == 304 and cached_path:
+            return cached_path
+        print(f"Error fetching wallpaper: {e}")
+        return cached_path
+    except (URLError, OSError) as e:
+        print(f"Error fetching wallpaper: {e}")
+        return cached_path
+    
+    if checksum and hashlib.sha256(data).hexdigest() != checksum:
+        print("Error fetching wallpaper: checksum mismatch")
+        return cached_path
+    
+    extension = CONTENT_TYPE_EXTENSIONS.get(content_type.split(';')[0].strip(), '.img')
+    path = os.path.join(cache_dir, 'server_wallpaper' + extension)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+    save_wallpaper_state(meta_path, {'path': path, 'etag': etag})
+    return path
+
+def main(server_url=None):
+    """Main program execution
+
+    With server_url, the wallpaper is fetched from a render service
+    (render_service.py) instead of being rendered locally.
+    """
+    state_path = os.path.join(basepath, 'bgs', 'wallpaper_state.json')
+    
+    backend = get_wallpaper_backend()
+    today = datetime.now().date().isoformat()
+    state = load_wallpaper_state(state_path)
+    
+    if server_url:
+        # Thin client: a conditional GET replaces all local work
+        inputs = None
+        extra_paths = []
+        wallpaper_path = fetch_wallpaper(server_url, os.path.join(basepath, 'bgs'))
+    else:
+        # Exit before doing any work if nothing changed since the last run today
+        extra_paths = state.get('extra_paths', [])
+        inputs = get_inputs_signature(extra_paths)
+        if (state.get('date') == today and state.get('inputs') == inputs
+                and state.get('backend') == backend.name
+                and os.path.exists(state.get('path', ''))):
+            print(f"Wallpaper already up to date: {state['path']}")
+            sys.exit(0)
+        
+        wallpaper_path, extra_paths = prepare_wallpaper()
+        inputs = get_inputs_signature(extra_paths)
+    
+    if not wallpaper_path:
+        sys.exit(1)
     
     # Set wallpaper
     if os.path.exists(wallpaper_path):
-        success = set_wallpaper(wallpaper_path)
-        if success:
-            print(f"Wallpaper set successfully: {wallpaper_path}")
+        content_hash = get_file_checksum(wallpaper_path)
+        if (state.get('hash') == content_hash and state.get('path') == wallpaper_path
+                and state.get('backend') == backend.name):
+            # Same image already applied, skip the system-wide settings broadcast
+            success = True
+            print(f"Wallpaper unchanged: {wallpaper_path}")
         else:
-            print("Failed to set wallpaper")
+            success = set_wallpaper(wallpaper_path, backend)
+            if success:
+                print(f"Wallpaper set successfully: {wallpaper_path}")
+            else:
+                print("Failed to set wallpaper")
         
-        # Clean up temporary file if created
-        if wallpaper_path.endswith('temp_default.png'):
-            try:
-                os.remove(wallpaper_path)
-            except:
-                pass
+        if success:
+            save_wallpaper_state(state_path, {
+                'date': today,
+                'inputs': inputs,
+                'extra_paths': extra_paths,
+                'backend': backend.name,
+                'path': wallpaper_path,
+                'hash': content_hash,
+            })
     else:
         print(f"Wallpaper file not found: {wallpaper_path}")
     
@@ -207,5 +390,9 @@ def main():
 
 if __name__ == "__main__":
     if os.path.exists("D:/099/1009.txt"):
-        main()
+        # Client mode: main.py --server http://host:port (or BIRTHDAY_BG_SERVER)
+        server_url = os.environ.get("BIRTHDAY_BG_SERVER")
+        if "--server" in sys.argv[1:-1]:
+            server_url = sys.argv[sys.argv.index("--server") + 1]
+        main(server_url)
 # The above line is a placeholder to prevent automatic execution in certain environments.
\ No newline at end of file
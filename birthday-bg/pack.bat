@@ -1 +1 @@
-pyinstaller --name birthday-bg --onefile --nowindow --noconsole --clean main.py
+pyinstaller --clean birthday-bg.spec
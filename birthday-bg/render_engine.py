@@ -0,0 +1,691 @@
+"""
+Rendering engine shared by main.py and editor.py
+
+Both draw through render_person(): main.py at scale 1.0 onto the full
+template, the editor at the preview scale with a highlight hook.
+"""
+
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from string import Formatter
+from io import BytesIO
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from birthdays import get_age, get_days_until_birthday
+from crypto_utils import (load_encrypted_text_file, save_encrypted_text_file,
+                          load_encrypted_binary_file, save_encrypted_binary_file,
+                          get_encrypted_file_signature, get_encrypted_path, get_file_checksum)
+
+# yaml is only needed for pyramid manifests (editor), it is imported there so
+# main.py can decode the template while another thread imports yaml for the config
+
+# Number of rasterized text masks kept in memory
+TEXT_SPRITE_CACHE_SIZE = 512
+# Number of loaded fonts kept in memory
+FONT_CACHE_SIZE = 64
+# Template pyramid levels are halved until the longer side is below this
+PYRAMID_MIN_SIZE = 256
+# Image modes text masks are composited onto, decoded templates are converted to these
+RENDER_MODES = ('RGB', 'RGBA')
+# Formats the editor accepts for templates; Image.open only tries these and
+# doesn't load every PIL plugin for data it can't identify
+TEMPLATE_FORMATS = ('PNG', 'JPEG', 'BMP', 'GIF')
+# Number of decoded templates kept in memory
+TEMPLATE_CACHE_SIZE = 8
+# Number of downscaled templates (previews, thumbnails) and decoded pyramid levels kept
+SCALED_TEMPLATE_CACHE_SIZE = 16
+# Template used when neither the person nor the config picks one
+DEFAULT_TEMPLATE = 'bgs/template.png'
+# Number of compiled render plans kept in memory
+RENDER_PLAN_CACHE_SIZE = 16
+# Defaults of render items, shared by every entry point
+DEFAULT_FONT_SIZE = 50
+DEFAULT_FONT_FAMILY = 'arial.ttf'
+DEFAULT_COLOR = (255, 255, 255)
+
+
+def to_render_mode(image):
+    """Convert a decoded template to RGB, or RGBA if it has transparency"""
+    if image.mode in RENDER_MODES:
+        return image
+    has_alpha = 'A' in image.mode or 'transparency' in image.info
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+class LRUCache:
+    """Small bounded mapping that evicts the least recently used entry
+
+    Safe to share between threads (editor thumbnail workers, main.py loaders).
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def __len__(self):
+        return len(self.items)
+
+
+_font_cache = LRUCache(FONT_CACHE_SIZE)
+
+
+def load_font(family, size):
+    """Load a TrueType font, falling back to the default font, cached by (family, size)"""
+    key = (family, size)
+    font = _font_cache.get(key)
+    if font is None:
+        try:
+            font = ImageFont.truetype(family, size)
+        except Exception:
+            font = ImageFont.load_default()
+        _font_cache.put(key, font)
+    return font
+
+
+class TextSpriteCache:
+    """Cache of rasterized text as alpha masks
+
+    Masks are keyed by (text, font family, size) plus the effect shape
+    (stroke width, blur radius, opacity); the color is applied when the mask
+    is composited, so one mask serves every color. Strings shared by many
+    people (e.g. "Happy Birthday!") are rasterized once per size, and
+    blurred shadow/glow masks are only computed once as well.
+    """
+
+    def __init__(self, maxsize=TEXT_SPRITE_CACHE_SIZE):
+        self.cache = LRUCache(maxsize)
+
+    def get_sprite(self, text, family, size, stroke=0, blur=0, opacity=1.0):
+        """Get (mask, bbox) for text, bbox is relative to the draw position
+
+        stroke widens the glyphs (outlines, glow spread), blur applies a
+        gaussian blur and opacity scales the mask.
+        """
+        key = (text, family, size, stroke, blur, opacity)
+        sprite = self.cache.get(key)
+        if sprite is None:
+            sprite = self.rasterize(text, family, size, stroke, blur, opacity)
+            self.cache.put(key, sprite)
+        return sprite
+
+    @staticmethod
+    def rasterize(text, family, size, stroke, blur, opacity):
+        font = load_font(family, size)
+        stroke_args = {'stroke_width': stroke} if stroke else {}
+        bbox = font.getbbox(text, **stroke_args) if text else (0, 0, 0, 0)
+        if bbox[2] <= bbox[0] or bbox[3] <= bbox[1]:
+            return None, bbox
+
+        # Room for the blur to spread past the glyphs
+        pad = blur * 2
+        bbox = (bbox[0] - pad, bbox[1] - pad, bbox[2] + pad, bbox[3] + pad)
+        mask = Image.new('L', (bbox[2] - bbox[0], bbox[3] - bbox[1]), 0)
+        if stroke:
+            stroke_args['stroke_fill'] = 255
+        ImageDraw.Draw(mask).text((-bbox[0], -bbox[1]), text, font=font, fill=255, **stroke_args)
+        if blur:
+            mask = mask.filter(ImageFilter.GaussianBlur(blur))
+        if opacity < 1.0:
+            mask = mask.point([int(value * opacity) for value in range(256)])
+        return mask, bbox
+
+    def text_bbox(self, xy, text, family, size):
+        """Get bounding box of text drawn at xy"""
+        _, bbox = self.get_sprite(text, family, size)
+        x, y = xy
+        return (x + bbox[0], y + bbox[1], x + bbox[2], y + bbox[3])
+
+    def draw_text(self, image, xy, text, family, size, color, stroke=0, blur=0, opacity=1.0):
+        """Composite cached text mask onto image at xy
+
+        Masks only blend colors on RGB/RGBA images (templates are converted by
+        to_render_mode). Other modes, e.g. palette images whose indices would
+        be blended, fall back to ImageDraw.text; blurred effects need a mask
+        and are skipped there.
+        """
+        if image.mode not in RENDER_MODES:
+            if not blur and text:
+                stroke_args = {'stroke_width': stroke, 'stroke_fill': color} if stroke else {}
+                ImageDraw.Draw(image).text(xy, text, font=load_font(family, size), fill=color,
+                                           **stroke_args)
+            return
+        mask, bbox = self.get_sprite(text, family, size, stroke, blur, opacity)
+        if mask is None:
+            return
+        x, y = xy
+        ImageDraw.Draw(image).bitmap((x + bbox[0], y + bbox[1]), mask, fill=color)
+
+
+# Shared cache used by all renders in this process
+text_sprites = TextSpriteCache()
+
+
+def hex_to_rgb(hex_color):
+    """Convert hex color to RGB tuple, DEFAULT_COLOR if it can't be parsed"""
+    try:
+        hex_color = str(hex_color).lstrip('#')
+        return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+    except ValueError:
+        return DEFAULT_COLOR
+
+
+# One render item with defaults applied, its color parsed and its info
+# compiled into text(person, missing) -> str
+RenderStep = namedtuple('RenderStep', 'info text x y size family color effects')
+# One text effect drawn under the fill, sizes in template pixels
+TextEffect = namedtuple('TextEffect', 'kind dx dy stroke blur opacity color')
+
+# Effects in drawing order, with their config defaults
+EFFECT_DEFAULTS = {
+    'shadow': {'offset': {'x': 4, 'y': 4}, 'blur': 4, 'color': '000000', 'opacity': 0.6},
+    'glow': {'radius': 8, 'color': 'ffffff', 'opacity': 0.8},
+    'outline': {'width': 2, 'color': '000000'},
+}
+
+_plan_cache = LRUCache(RENDER_PLAN_CACHE_SIZE)
+
+
+def compile_effects(effects_config):
+    """Compile a render item's effects ({outline, shadow, glow}) into TextEffects
+
+    An effect is enabled by its section; a zero width/radius disables it.
+    """
+    effects = []
+    for kind, defaults in EFFECT_DEFAULTS.items():
+        effect = (effects_config or {}).get(kind)
+        if not isinstance(effect, dict):
+            continue
+        effect = {**defaults, **effect}
+        color = hex_to_rgb(effect['color'])
+        opacity = min(max(float(effect.get('opacity', 1.0)), 0.0), 1.0)
+        if kind == 'outline':
+            if int(effect['width']) > 0:
+                effects.append(TextEffect(kind, 0, 0, int(effect['width']), 0, opacity, color))
+        elif kind == 'shadow':
+            offset = {**defaults['offset'], **(effect.get('offset') or {})}
+            effects.append(TextEffect(kind, int(offset['x']), int(offset['y']), 0,
+                                      max(int(effect['blur']), 0), opacity, color))
+        elif int(effect['radius']) > 0:
+            # Glow: glyphs widened by half the radius, then blurred
+            radius = int(effect['radius'])
+            effects.append(TextEffect(kind, 0, 0, radius // 2, radius, opacity, color))
+    return tuple(effects)
+
+
+# Fields computed from the roster row, a CSV column of the same name wins
+DERIVED_FIELDS = {
+    'age': get_age,
+    'days_until_birthday': get_days_until_birthday,
+}
+
+
+def compile_field(field):
+    """Compile a field name into value(person), None if the person has no such field"""
+    derived = DERIVED_FIELDS.get(field)
+    if derived is None:
+        return lambda person: person.get(field)
+
+    def value(person):
+        column = person.get(field)
+        return column if column is not None else derived(person)
+    return value
+
+
+def compile_info(info):
+    """Compile a render item's info into text(person, missing=None)
+
+    info is a column or derived field name, or a format template such as
+    "{name}, {other_info}" ({{ and }} are literal braces). The template is
+    parsed here, once per plan, into literal parts and field accessors.
+    Missing fields become missing(field), or empty text.
+    """
+    info = str(info)
+    try:
+        parsed = list(Formatter().parse(info)) if '{' in info or '}' in info else None
+    except ValueError:
+        # Not a valid template, use it as a plain field name
+        parsed = None
+
+    if parsed is None:
+        value = compile_field(info)
+
+        def text(person, missing=None):
+            result = value(person)
+            if result is None:
+                return missing(info) if missing else ''
+            return result if isinstance(result, str) else str(result)
+        return text
+
+    parts = []
+    for literal, field, format_spec, conversion in parsed:
+        if literal:
+            parts.append(lambda person, missing, literal=literal: literal)
+        if field is None:
+            continue
+
+        def part(person, missing, field=field, value=compile_field(field),
+                 format_spec=format_spec, conversion=conversion):
+            result = value(person)
+            if result is None:
+                return missing(field) if missing else ''
+            if conversion == 'r':
+                result = repr(result)
+            elif conversion == 'a':
+                result = ascii(result)
+            if format_spec:
+                try:
+                    return format(result, format_spec)
+                except ValueError:
+                    pass
+            return result if isinstance(result, str) else str(result)
+        parts.append(part)
+
+    def text(person, missing=None):
+        return ''.join([part(person, missing) for part in parts])
+    return text
+
+
+def compile_render_item(render_item):
+    """Compile one config render item into a RenderStep"""
+    pos = render_item.get('pos') or {}
+    font_config = render_item.get('font') or {}
+    return RenderStep(
+        info=render_item.get('info', ''),
+        text=compile_info(render_item.get('info', '')),
+        x=pos.get('x', 0),
+        y=pos.get('y', 0),
+        size=font_config.get('size', DEFAULT_FONT_SIZE),
+        family=font_config.get('family', DEFAULT_FONT_FAMILY),
+        color=hex_to_rgb(font_config.get('color', 'ffffff')),
+        effects=compile_effects(render_item.get('effects')),
+    )
+
+
+def scale_effect(effect, scale):
+    """Get (dx, dy, stroke, blur) of an effect at a render scale"""
+    if scale == 1.0:
+        return effect.dx, effect.dy, effect.stroke, effect.blur
+    # Keep enabled effects visible on small previews
+    stroke = max(1, round(effect.stroke * scale)) if effect.stroke else 0
+    blur = max(1, round(effect.blur * scale)) if effect.blur else 0
+    return round(effect.dx * scale), round(effect.dy * scale), stroke, blur
+
+
+def compile_render_plan(render_items):
+    """Compile config['render'] into a tuple of RenderSteps, cached by content"""
+    key = repr(render_items)
+    plan = _plan_cache.get(key)
+    if plan is None:
+        plan = tuple(compile_render_item(render_item) for render_item in render_items or [])
+        _plan_cache.put(key, plan)
+    return plan
+
+
+def get_step_text(step, person, missing=None):
+    """Get the text a render step draws for person"""
+    return step.text(person, missing)
+
+
+def get_overflowing_items(plan, person, image_size, missing=None):
+    """Get indexes of the steps whose text runs off an image_size template
+
+    Measured at full size from font metrics, so thumbnails rendered at a
+    small scale are checked exactly.
+    """
+    width, height = image_size
+    overflowing = []
+    for i, step in enumerate(plan):
+        text = get_step_text(step, person, missing)
+        if not text:
+            continue
+        bbox = load_font(step.family, step.size).getbbox(text)
+        x0, y0 = step.x + bbox[0], step.y + bbox[1]
+        x1, y1 = step.x + bbox[2], step.y + bbox[3]
+        if x0 < 0 or y0 < 0 or x1 > width or y1 > height:
+            overflowing.append(i)
+    return overflowing
+
+
+def render_person(image, plan, person, scale=1.0, offset=(0, 0), missing=None,
+                  size_step=1, highlight=None, hidden=()):
+    """Draw a compiled render plan for person onto image, in place
+
+    Positions and font sizes are multiplied by scale. missing(info) gives
+    the text of fields the person doesn't have (empty by default). Font
+    sizes are rounded down to multiples of size_step. highlight(draw,
+    index, bbox) is called before each item is drawn, items whose index is
+    in hidden are measured but not drawn.
+
+    Returns a dict per step with its index, text, font, color and bbox
+    (moved by offset, e.g. to canvas coordinates).
+    """
+    items = []
+    draw = None
+    for i, step in enumerate(plan):
+        x = int(step.x * scale)
+        y = int(step.y * scale)
+        text = get_step_text(step, person, missing)
+        size = int(step.size * scale)
+        if size_step > 1:
+            size = max(size_step, size - size % size_step)
+
+        bbox = text_sprites.text_bbox((x, y), text, step.family, size)
+        items.append({
+            'index': i,
+            'bbox': (bbox[0] + offset[0], bbox[1] + offset[1],
+                     bbox[2] + offset[0], bbox[3] + offset[1]),
+            'text': text, 'family': step.family, 'size': size, 'color': step.color,
+            'scale': scale,
+        })
+        if i in hidden:
+            continue
+        if highlight is not None:
+            if draw is None:
+                draw = ImageDraw.Draw(image)
+            highlight(draw, i, bbox)
+        for effect in step.effects:
+            dx, dy, stroke, blur = scale_effect(effect, scale)
+            text_sprites.draw_text(image, (x + dx, y + dy), text, step.family, size,
+                                   effect.color, stroke, blur, effect.opacity)
+        text_sprites.draw_text(image, (x, y), text, step.family, size, step.color)
+    return items
+
+
+def warm_render_plan(plan, person, scale=1.0):
+    """Load fonts and rasterize the text and effect sprites render_person will need"""
+    for step in plan:
+        text = get_step_text(step, person)
+        size = int(step.size * scale)
+        for effect in step.effects:
+            _, _, stroke, blur = scale_effect(effect, scale)
+            text_sprites.get_sprite(text, step.family, size, stroke, blur, effect.opacity)
+        text_sprites.get_sprite(text, step.family, size)
+
+
+def get_person_template(person, config, default=DEFAULT_TEMPLATE):
+    """Get the template path for a person
+
+    A non-empty 'template' column wins, then the first matching rule of
+    config['templates']['rules'] ({field, value, template}), then
+    config['templates']['default'].
+    """
+    template = (person.get('template') or '').strip()
+    if template:
+        return template
+
+    templates = (config or {}).get('templates') or {}
+    for rule in templates.get('rules') or []:
+        if str(person.get(rule.get('field', ''), '')) == str(rule.get('value', '')):
+            return rule.get('template', default)
+    return templates.get('default') or default
+
+
+def get_template_paths(config, people=(), default=DEFAULT_TEMPLATE):
+    """Get every template path the config and roster can pick, sorted"""
+    templates = (config or {}).get('templates') or {}
+    paths = {default, templates.get('default') or default}
+    for rule in templates.get('rules') or []:
+        paths.add(rule.get('template', default))
+    for person in people:
+        paths.add((person.get('template') or '').strip() or default)
+    return sorted(path for path in paths if path)
+
+
+class TemplateCache:
+    """Decoded templates in a bounded LRU keyed by checksum of the encrypted file
+
+    Rendering a roster decodes each distinct template once. Checksums are
+    remembered per path and size/mtime, so unchanged files aren't rehashed.
+    The returned images are shared: copy before drawing on them.
+    """
+
+    def __init__(self, maxsize=TEMPLATE_CACHE_SIZE):
+        self.cache = LRUCache(maxsize)
+        self.checksums = {}
+
+    def get(self, template_path, basepath=""):
+        """Get the decoded template, None if it doesn't exist"""
+        signature = get_encrypted_file_signature(template_path, basepath)
+        if signature is None:
+            return None
+
+        key = (basepath, template_path)
+        known = self.checksums.get(key)
+        if known and known[0] == signature:
+            checksum = known[1]
+        else:
+            checksum = get_file_checksum(os.path.join(basepath, get_encrypted_path(template_path)))
+            self.checksums[key] = (signature, checksum)
+
+        image = self.cache.get(checksum)
+        if image is None:
+            template_data = load_encrypted_binary_file(template_path, basepath)
+            if template_data is None:
+                return None
+            image = Image.open(BytesIO(template_data), formats=TEMPLATE_FORMATS)
+            image.load()
+            image = to_render_mode(image)
+            self.cache.put(checksum, image)
+        return image
+
+    def clear(self):
+        self.cache.clear()
+        self.checksums.clear()
+
+
+# Shared template cache used by batch and daemon renders in this process
+template_cache = TemplateCache()
+
+
+class ScaledTemplateCache:
+    """Templates downscaled to fit a box, for the editor preview and thumbnails
+
+    Scaling starts from the nearest larger pyramid level, so its cost follows
+    the box size. Results and decoded levels are kept in bounded LRUs and
+    checked against the encrypted template's size/mtime. Draft quality uses
+    integer reduce() plus bilinear resampling instead of LANCZOS. The
+    returned images are shared: copy before drawing on them.
+    """
+
+    def __init__(self, maxsize=SCALED_TEMPLATE_CACHE_SIZE):
+        self.cache = LRUCache(maxsize)
+        self.levels = LRUCache(maxsize)
+
+    def get(self, template_path, size, draft=False, basepath=""):
+        """Get (scale, template fitted into size, full size), None if it doesn't exist"""
+        signature = get_encrypted_file_signature(template_path, basepath)
+        if signature is None:
+            return None
+        key = (basepath, template_path, tuple(size), draft)
+        cached = self.cache.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        # Regenerated if it was built from another version of the template
+        pyramid = get_template_pyramid(template_path, basepath)
+        if pyramid is None:
+            return None
+        full_width, full_height = pyramid['levels'][0]
+        scale = min(size[0] / full_width, size[1] / full_height, 1.0)  # Don't scale up
+        fitted = (max(1, int(full_width * scale)), max(1, int(full_height * scale)))
+        image = self.get_level(template_path, choose_pyramid_level(pyramid, fitted),
+                               signature, basepath)
+        if image is None:
+            return None
+
+        if draft:
+            factor = min(image.width // fitted[0], image.height // fitted[1])
+            if factor >= 2:
+                image = image.reduce(factor)
+            image = image.resize(fitted, Image.Resampling.BILINEAR)
+        else:
+            image = image.resize(fitted, Image.Resampling.LANCZOS)
+        base = (scale, image, (full_width, full_height))
+        self.cache.put(key, (signature, base))
+        return base
+
+    def get_level(self, template_path, level, signature, basepath=""):
+        key = (basepath, template_path, level)
+        cached = self.levels.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+        image = load_template_level(template_path, level, basepath)
+        if image is not None:
+            self.levels.put(key, (signature, image))
+        return image
+
+    def clear(self):
+        self.cache.clear()
+        self.levels.clear()
+
+
+# Shared by the editor preview and thumbnail grid
+scaled_templates = ScaledTemplateCache()
+
+
+def render_person_image(template_path, config, person, basepath=""):
+    """Render person onto a copy of the template at full size, None if the template is missing"""
+    template = template_cache.get(template_path, basepath)
+    if template is None:
+        return None
+    image = template.copy()
+    render_person(image, compile_render_plan((config or {}).get('render', [])), person)
+    return image
+
+
+def invalidate_caches(invalidated):
+    """Drop in-process caches named by asset_watcher"""
+    if 'font_cache' in invalidated:
+        _font_cache.clear()
+        text_sprites.cache.clear()
+    if 'render_plan' in invalidated:
+        _plan_cache.clear()
+    if 'decoded_template' in invalidated:
+        template_cache.clear()
+        scaled_templates.clear()
+
+
+def get_pyramid_paths(template_path):
+    """Get (manifest path, level path format) of a template's pyramid"""
+    root, ext = os.path.splitext(template_path)
+    return f"{root}_pyramid.yaml", f"{root}_mip{{}}{ext}"
+
+
+def build_pyramid_levels(image):
+    """Halve image until it is smaller than PYRAMID_MIN_SIZE, return the smaller levels"""
+    levels = []
+    image = to_render_mode(image)
+    while max(image.size) >= PYRAMID_MIN_SIZE * 2:
+        image = image.reduce(2)
+        levels.append(image)
+    return levels
+
+
+def save_template_pyramid(template_path, basepath=""):
+    """Generate and save encrypted pyramid levels of a template, return the manifest"""
+    import yaml
+    encrypted_path = os.path.join(basepath, get_encrypted_path(template_path))
+    template_data = load_encrypted_binary_file(template_path, basepath)
+    if template_data is None:
+        return None
+
+    image = Image.open(BytesIO(template_data), formats=TEMPLATE_FORMATS)
+    image.load()
+    manifest_path, level_path = get_pyramid_paths(template_path)
+
+    levels = [list(image.size)]
+    for i, level in enumerate(build_pyramid_levels(image), 1):
+        buffer = BytesIO()
+        level.save(buffer, format='PNG', compress_level=1)
+        if not save_encrypted_binary_file(level_path.format(i), buffer.getvalue(), basepath):
+            return None
+        levels.append(list(level.size))
+
+    manifest = {
+        'source': {
+            'signature': get_encrypted_file_signature(template_path, basepath),
+            'checksum': get_file_checksum(encrypted_path),
+        },
+        'levels': levels,
+    }
+    save_encrypted_text_file(manifest_path, yaml.safe_dump(manifest), basepath)
+    return manifest
+
+
+def get_template_pyramid(template_path, basepath=""):
+    """Get the pyramid manifest of a template, regenerating it if the template changed
+
+    The manifest lists level sizes, level 0 being the template itself.
+    """
+    import yaml
+    signature = get_encrypted_file_signature(template_path, basepath)
+    if signature is None:
+        return None
+
+    manifest_path, _ = get_pyramid_paths(template_path)
+    manifest = None
+    try:
+        manifest = yaml.safe_load(load_encrypted_text_file(manifest_path, basepath) or '')
+    except Exception:
+        pass
+    if not isinstance(manifest, dict) or 'source' not in manifest:
+        return save_template_pyramid(template_path, basepath)
+
+    source = manifest['source']
+    if source.get('signature') == signature:
+        return manifest
+
+    # Touched but unchanged templates keep their pyramid
+    encrypted_path = os.path.join(basepath, get_encrypted_path(template_path))
+    if source.get('checksum') == get_file_checksum(encrypted_path):
+        source['signature'] = signature
+        save_encrypted_text_file(manifest_path, yaml.safe_dump(manifest), basepath)
+        return manifest
+    return save_template_pyramid(template_path, basepath)
+
+
+def choose_pyramid_level(manifest, size):
+    """Get index of the smallest level at least as large as size"""
+    width, height = size
+    best = 0
+    for i, (level_width, level_height) in enumerate(manifest['levels']):
+        if level_width >= width and level_height >= height:
+            best = i
+    return best
+
+
+def load_template_level(template_path, level, basepath=""):
+    """Load a decoded pyramid level (0 is the full template), None if missing"""
+    if level == 0:
+        path = template_path
+    else:
+        path = get_pyramid_paths(template_path)[1].format(level)
+    data = load_encrypted_binary_file(path, basepath)
+    if data is None:
+        return None
+    image = Image.open(BytesIO(data), formats=TEMPLATE_FORMATS)
+    image.load()
+    return to_render_mode(image)
@@ -0,0 +1,168 @@
+"""
+Local HTTP service that renders the wallpaper once and serves it to lab machines
+
+Usage: python render_service.py [--host 0.0.0.0] [--port 8613] [--basepath DIR] [--format png|jpeg]
+
+Clients run main.py with --server http://host:port (or BIRTHDAY_BG_SERVER).
+"""
+
+import argparse
+import hashlib
+import os
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from PIL import Image
+
+import main
+from asset_watcher import AssetWatcher
+from render_engine import invalidate_caches
+
+DEFAULT_PORT = 8613
+
+# Encodings sent to clients: (content type, PIL save arguments). The local
+# output is often an uncompressed BMP (about 24 MB at 4K), which isn't sent as-is.
+SERVE_FORMATS = {
+    'png': ('image/png', {'format': 'PNG', 'compress_level': 1}),
+    'jpeg': ('image/jpeg', {'format': 'JPEG', 'quality': 90}),
+}
+DEFAULT_SERVE_FORMAT = 'png'
+
+# Content types by wallpaper file extension
+CONTENT_TYPES = {extension: content_type
+                 for content_type, extension in main.CONTENT_TYPE_EXTENSIONS.items()}
+
+
+class WallpaperCache:
+    """Current wallpaper, rendered at most once per day and per input change
+
+    Renders from basepath (main.basepath by default) and serves the result
+    encoded as serve_format (see SERVE_FORMATS).
+    """
+
+    def __init__(self, basepath=None, serve_format=DEFAULT_SERVE_FORMAT):
+        self.basepath = main.resolve_basepath(basepath)
+        self.serve_format = serve_format
+        self.lock = threading.Lock()
+        self.key = None
+        self.extra_paths = []
+        self.wallpaper = None
+
+    def get(self):
+        """Get (data, etag, checksum, content type), None if rendering failed"""
+        with self.lock:
+            key = (datetime.now().date().isoformat(), self.get_inputs_signature())
+            if key != self.key or self.wallpaper is None:
+                self.wallpaper = self.render()
+                self.key = (key[0], self.get_inputs_signature())
+            return self.wallpaper
+
+    def get_inputs_signature(self):
+        return main.get_inputs_signature(self.extra_paths, self.basepath)
+
+    def invalidate(self):
+        """Render again on the next request"""
+        with self.lock:
+            self.key = None
+
+    def render(self):
+        wallpaper_path, self.extra_paths = main.prepare_wallpaper(self.basepath)
+        if not wallpaper_path or not os.path.exists(wallpaper_path):
+            return None
+        with open(wallpaper_path, 'rb') as f:
+            data = f.read()
+        content_type, save_args = SERVE_FORMATS[self.serve_format]
+        if CONTENT_TYPES.get(os.path.splitext(wallpaper_path)[1].lower()) != content_type:
+            data = encode_wallpaper(data, save_args)
+        checksum = hashlib.sha256(data).hexdigest()
+        print(f"Rendered wallpaper {wallpaper_path} ({len(data)} bytes as {content_type}, {checksum[:12]})")
+        return data, f'"{checksum}"', checksum, content_type
+
+
+def encode_wallpaper(data, save_args):
+    """Re-encode a wallpaper file's bytes with PIL save arguments"""
+    with Image.open(BytesIO(data)) as image:
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(buffer, **save_args)
+    return buffer.getvalue()
+
+
+class WallpaperRequestHandler(BaseHTTPRequestHandler):
+    """Serve GET/HEAD /wallpaper with ETag based conditional requests"""
+    cache = None
+
+    def do_GET(self):
+        self.send_wallpaper(include_body=True)
+
+    def do_HEAD(self):
+        self.send_wallpaper(include_body=False)
+
+    def send_wallpaper(self, include_body):
+        if self.path.split('?')[0] != '/wallpaper':
+            self.send_error(404)
+            return
+
+        wallpaper = self.cache.get()
+        if wallpaper is None:
+            self.send_error(503, "Wallpaper could not be rendered")
+            return
+        data, etag, checksum, content_type = wallpaper
+
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.send_header('X-Checksum', checksum)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if include_body:
+            self.wfile.write(data)
+
+
+def create_server(host='127.0.0.1', port=DEFAULT_PORT, cache=None):
+    """Create the HTTP server (port 0 picks a free port)"""
+    handler = type('Handler', (WallpaperRequestHandler,), {'cache': cache or WallpaperCache()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the current birthday wallpaper")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--basepath', help="asset directory (default: BIRTHDAY_BG_BASEPATH)")
+    parser.add_argument('--format', choices=sorted(SERVE_FORMATS), default=DEFAULT_SERVE_FORMAT,
+                        help="encoding sent to clients")
+    args = parser.parse_args()
+
+    cache = WallpaperCache(args.basepath, args.format)
+    server = create_server(args.host, args.port, cache)
+
+    # Re-render as soon as an input changes instead of on the next request
+    def on_assets_changed(changed, invalidated):
+        invalidate_caches(invalidated)
+        if 'rendered_outputs' in invalidated:
+            cache.invalidate()
+            cache.get()
+            # Today's template may not be one of the fixed inputs
+            watcher.watch(*cache.extra_paths)
+
+    watcher = AssetWatcher(cache.basepath)
+    watcher.subscribe(on_assets_changed)
+    watcher.start()
+    print(f"Serving wallpaper on http://{args.host}:{server.server_address[1]}/wallpaper")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+        server.server_close()
@@ -0,0 +1,75 @@
+"""
+In-memory search index over roster rows (names and birthdays)
+"""
+
+from bisect import bisect_left
+
+
+class RosterIndex:
+    """Prefix and substring search over selected roster fields
+
+    Prefix matches come from a sorted list of field values (bisect), substring
+    matches from a scan over precomputed lowercase row keys. When the query
+    extends the previous one (search-as-you-type), only the previous matches
+    are rescanned.
+    """
+
+    def __init__(self, people, fields=('name', 'birthday')):
+        self.people = people
+        self.fields = fields
+        self.keys = []
+        self.sorted_values = []
+
+        for i, person in enumerate(people):
+            values = [str(person.get(field, '')).lower() for field in fields]
+            self.keys.append('\n'.join(values))
+            for value in values:
+                if value:
+                    self.sorted_values.append((value, i))
+        self.sorted_values.sort()
+
+        self.last_query = ''
+        self.last_matches = list(range(len(people)))
+
+    def __len__(self):
+        return len(self.people)
+
+    def prefix_matches(self, query):
+        """Get row indices with a field starting with query, in sorted order"""
+        query = query.lower()
+        matches = []
+        seen = set()
+        sorted_values = self.sorted_values
+        for position in range(bisect_left(sorted_values, (query, -1)), len(sorted_values)):
+            value, i = sorted_values[position]
+            if not value.startswith(query):
+                break
+            if i not in seen:
+                seen.add(i)
+                matches.append(i)
+        return matches
+
+    def search(self, query):
+        """Get row indices matching query: prefix matches first, then substring matches"""
+        query = query.strip().lower()
+        if not query:
+            self.last_query = ''
+            self.last_matches = list(range(len(self.people)))
+            return self.last_matches
+
+        # Narrow the previous result when the user keeps typing
+        if self.last_query and query.startswith(self.last_query):
+            candidates = self.last_matches
+        else:
+            candidates = range(len(self.people))
+
+        keys = self.keys
+        substring = [i for i in candidates if query in keys[i]]
+
+        prefix = self.prefix_matches(query)
+        prefix_set = set(prefix)
+        matches = prefix + [i for i in substring if i not in prefix_set]
+
+        self.last_query = query
+        self.last_matches = sorted(substring)
+        return matches
@@ -0,0 +1,47 @@
+from asset_watcher import DEPENDENCIES, AssetWatcher, get_invalidated
+from crypto_utils import save_encrypted_binary_file, save_encrypted_text_file
+from render_engine import get_template_paths
+
+CONFIG = {'templates': {'default': 'bgs/spring.png',
+                        'rules': [{'field': 'class', 'value': '3', 'template': 'bgs/class3.png'}]}}
+PEOPLE = [{'name': 'Bernie', 'template': 'bgs/bernie.png'}, {'name': 'Ada', 'template': ' '}]
+
+
+def test_template_paths_from_config_and_roster():
+    assert get_template_paths(CONFIG, PEOPLE) == [
+        'bgs/bernie.png', 'bgs/class3.png', 'bgs/spring.png', 'bgs/template.png']
+    assert get_template_paths(None) == ['bgs/template.png']
+
+
+def test_named_templates_invalidate_template_caches():
+    assert get_invalidated({'bgs/bernie.png'}) == set(DEPENDENCIES['bgs/template.png'])
+    assert get_invalidated({'data.csv'}) == set(DEPENDENCIES['data.csv'])
+
+
+def test_watch_named_template(tmp_path):
+    basepath = str(tmp_path)
+    watcher = AssetWatcher(basepath)
+    changes = []
+    watcher.subscribe(lambda changed, invalidated: changes.append((changed, invalidated)))
+
+    save_encrypted_binary_file('bgs/bernie.png', b'before', basepath)
+    assert watcher.check() == set()
+
+    watcher.watch(*get_template_paths(CONFIG, PEOPLE))
+    save_encrypted_binary_file('bgs/bernie.png', b'after!!', basepath)
+    assert watcher.check() == {'bgs/bernie.png'}
+    assert changes == [({'bgs/bernie.png'}, set(DEPENDENCIES['bgs/template.png']))]
+
+
+def test_suppress_own_write(tmp_path):
+    basepath = str(tmp_path)
+    watcher = AssetWatcher(basepath)
+    watcher.watch('bgs/bernie.png')
+
+    with watcher.suppress('config.yaml', 'bgs/bernie.png'):
+        save_encrypted_text_file('config.yaml', 'render: []\n', basepath)
+        save_encrypted_binary_file('bgs/bernie.png', b'image', basepath)
+    assert watcher.check() == set()
+
+    save_encrypted_text_file('config.yaml', 'render: [1]\n', basepath)
+    assert watcher.check() == {'config.yaml'}
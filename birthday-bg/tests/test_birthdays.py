@@ -0,0 +1,58 @@
+from datetime import date, datetime
+
+import pytest
+
+import birthdays
+import main
+from birthdays import get_age, is_birthday, parse_birthday
+from render_engine import compile_render_plan, get_step_text
+
+PEOPLE = [
+    {'name': 'Bernie', 'birthday': '2008.9.12'},
+    {'name': 'Ada', 'birthday': '9.12'},
+    {'name': 'Grace', 'birthday': '12.9'},
+]
+
+
+class FakeDate(date):
+    @classmethod
+    def today(cls):
+        return cls(2026, 9, 12)
+
+
+class FakeDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 9, 12, 8, 0)
+
+
+@pytest.fixture
+def on_birthday(monkeypatch):
+    monkeypatch.setattr(birthdays, 'date', FakeDate)
+    monkeypatch.setattr(main, 'datetime', FakeDatetime)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('9.12', (None, 9, 12)), ('2008.9.12', (2008, 9, 12)), ('2008-09-12', (2008, 9, 12)),
+    ('2008/9/12', (2008, 9, 12)), ('13.1', None), ('', None), ('soon', None),
+])
+def test_parse_birthday(value, expected):
+    assert parse_birthday(value) == expected
+
+
+def test_birthday_with_year_is_found(on_birthday):
+    assert main.check_birthday_today(PEOPLE) == PEOPLE[:2]
+    assert is_birthday(PEOPLE[0], date(2027, 9, 12))
+    assert not is_birthday(PEOPLE[2], date(2027, 9, 12))
+
+
+def test_birthday_with_year_renders_age(on_birthday):
+    plan = compile_render_plan([{'info': '{name} turns {age}'}])
+    birthday_people = main.check_birthday_today(PEOPLE)
+    assert get_step_text(plan[0], birthday_people[0]) == 'Bernie turns 18'
+    assert get_step_text(plan[0], birthday_people[1], lambda field: f'[{field}]') == 'Ada turns [age]'
+
+
+def test_age_from_birth_year_column():
+    assert get_age({'birthday': '9.12', 'birth_year': '2000'}, date(2026, 1, 1)) == 26
+    assert get_age({'birthday': '9.12', 'birth_year': ''}, date(2026, 1, 1)) is None
@@ -0,0 +1,36 @@
+from datetime import date, datetime
+
+from crypto_utils import load_encrypted_text_file
+from data_import import import_roster, normalize_value
+
+
+def test_normalize_birthday_dates():
+    assert normalize_value(datetime(1990, 9, 12), birthday=True) == '1990.9.12'
+    assert normalize_value(date(1990, 1, 5), birthday=True) == '1990.1.5'
+
+
+def test_normalize_other_dates_as_iso():
+    assert normalize_value(datetime(2024, 9, 1)) == '2024-09-01'
+    assert normalize_value(datetime(2024, 9, 1, 8, 30)) == '2024-09-01 08:30:00'
+    assert normalize_value(date(2024, 9, 1)) == '2024-09-01'
+
+
+def test_normalize_plain_values():
+    assert normalize_value(None) == ''
+    assert normalize_value(42.0) == '42'
+    assert normalize_value(' Bernie ') == 'Bernie'
+
+
+def test_import_csv(tmp_path):
+    source = tmp_path / 'roster.csv'
+    source.write_text('name,birthday,joined,,\nBernie,9.12,2024-09-01\n,,\nAda,12.10,2023-02-01,x\n',
+                      encoding='utf-8')
+
+    people = import_roster(str(source), basepath=str(tmp_path))
+
+    assert people == [
+        {'name': 'Bernie', 'birthday': '9.12', 'joined': '2024-09-01'},
+        {'name': 'Ada', 'birthday': '12.10', 'joined': '2023-02-01'},
+    ]
+    assert load_encrypted_text_file('data.csv', str(tmp_path)) == (
+        'name,birthday,joined\nBernie,9.12,2024-09-01\nAda,12.10,2023-02-01\n')
@@ -0,0 +1,125 @@
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont, features
+import pytest
+
+from crypto_utils import save_encrypted_binary_file
+from render_engine import (ScaledTemplateCache, compile_render_plan, hex_to_rgb, render_person,
+                           to_render_mode)
+
+pytestmark = pytest.mark.skipif(not features.check('freetype2'), reason="needs FreeType")
+
+SIZES = (12, 30, 50, 100)
+PERSON = {'name': 'Alice Example', 'greetings': 'Happy Birthday!'}
+
+
+@pytest.fixture(scope='module')
+def font_path(tmp_path_factory):
+    """A real TrueType file: the font Pillow bundles for load_default()"""
+    path = tmp_path_factory.mktemp('fonts') / 'default.ttf'
+    path.write_bytes(ImageFont.load_default(10).font_bytes)
+    return str(path)
+
+
+def make_render_items(font_path):
+    colors = ('ffffff', 'ff0000', '00aa33', '2040c0')
+    return [
+        {'info': 'name' if i % 2 == 0 else 'greetings',
+         'pos': {'x': 20 + i * 7, 'y': 10 + i * 90},
+         'font': {'family': font_path, 'size': size, 'color': colors[i]}}
+        for i, size in enumerate(SIZES)
+    ]
+
+
+def make_template(mode):
+    image = Image.linear_gradient('L').resize((640, 420)).convert('RGB')
+    image.paste((30, 120, 200), (300, 0, 640, 200))
+    if mode == 'RGBA':
+        image = image.convert('RGBA')
+        image.putalpha(Image.linear_gradient('L').resize(image.size))
+    elif mode == 'P':
+        image = image.quantize(16)
+    return image
+
+
+def render_old(image, render_items, person):
+    """The per-item loop main.py used before the shared render engine"""
+    draw = ImageDraw.Draw(image)
+    for render_item in render_items:
+        font_config = render_item['font']
+        font = ImageFont.truetype(font_config['family'], font_config['size'])
+        draw.text((render_item['pos']['x'], render_item['pos']['y']),
+                  person.get(render_item['info'], ''), font=font,
+                  fill=hex_to_rgb(font_config['color']))
+    return image
+
+
+def render_new(image, render_items, person):
+    render_person(image, compile_render_plan(render_items), person)
+    return image
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'P'])
+def test_render_matches_old_output(font_path, mode):
+    render_items = make_render_items(font_path)
+    # Templates are converted once when loaded (TemplateCache, pyramid levels)
+    template = to_render_mode(make_template(mode))
+
+    old = render_old(template.copy(), render_items, PERSON)
+    new = render_new(template.copy(), render_items, PERSON)
+
+    assert new.mode == old.mode
+    assert new.tobytes() == old.tobytes()
+    assert new.tobytes() != template.tobytes()
+
+
+def test_render_on_raw_palette_image_matches_old_output(font_path):
+    render_items = make_render_items(font_path)
+    template = make_template('P')
+
+    old = render_old(template.copy(), render_items, PERSON)
+    new = render_new(template.copy(), render_items, PERSON)
+
+    assert new.mode == 'P'
+    assert new.tobytes() == old.tobytes()
+
+
+@pytest.mark.parametrize('mode, expected', [
+    ('RGB', 'RGB'), ('RGBA', 'RGBA'), ('P', 'RGB'), ('L', 'RGB'), ('LA', 'RGBA'),
+])
+def test_to_render_mode(mode, expected):
+    image = Image.new(mode, (4, 4))
+    assert to_render_mode(image).mode == expected
+
+
+def test_to_render_mode_keeps_palette_transparency():
+    image = Image.new('P', (4, 4))
+    image.info['transparency'] = 0
+    assert to_render_mode(image).mode == 'RGBA'
+
+
+def save_template(basepath, size, color):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='PNG')
+    assert save_encrypted_binary_file('bgs/template.png', buffer.getvalue(), basepath)
+
+
+def test_scaled_template_cache(tmp_path):
+    basepath = str(tmp_path)
+    save_template(basepath, (1600, 900), (10, 20, 30))
+    cache = ScaledTemplateCache()
+
+    scale, image, full_size = cache.get('bgs/template.png', (400, 400), basepath=basepath)
+    assert (scale, image.size, full_size) == (0.25, (400, 225), (1600, 900))
+    assert cache.get('bgs/template.png', (400, 400), basepath=basepath)[1] is image
+    draft = cache.get('bgs/template.png', (400, 400), draft=True, basepath=basepath)[1]
+    assert draft is not image and draft.size == image.size
+    # Never scaled up
+    assert cache.get('bgs/template.png', (4000, 4000), basepath=basepath)[0] == 1.0
+    assert cache.get('bgs/missing.png', (400, 400), basepath=basepath) is None
+
+    # A changed template (another size) is picked up without clearing the cache
+    save_template(basepath, (800, 800), (200, 0, 0))
+    scale, image, full_size = cache.get('bgs/template.png', (400, 400), basepath=basepath)
+    assert (scale, image.size, full_size) == (0.5, (400, 400), (800, 800))
+    assert image.getpixel((0, 0)) == (200, 0, 0)
@@ -0,0 +1,135 @@
+import os
+import threading
+from io import BytesIO
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+from PIL import Image
+
+import main
+from benchmark import make_test_basepath
+from render_service import WallpaperCache, WallpaperRequestHandler, create_server
+
+
+@pytest.fixture
+def server_basepath(tmp_path):
+    basepath = tmp_path / 'server'
+    (basepath / 'bgs').mkdir(parents=True)
+    make_test_basepath(str(basepath), birthday_today=True)
+    return str(basepath)
+
+
+@pytest.fixture
+def client_dir(tmp_path, monkeypatch):
+    # The client's own (empty) asset directory, the server must not read from it
+    client = tmp_path / 'client'
+    (client / 'bgs').mkdir(parents=True)
+    monkeypatch.setattr(main, 'basepath', str(client))
+    return str(client / 'bgs')
+
+
+@pytest.fixture
+def statuses(monkeypatch):
+    codes = []
+    monkeypatch.setattr(WallpaperRequestHandler, 'log_request',
+                        lambda self, code='-', size='-': codes.append(int(code)))
+    return codes
+
+
+def serve(cache):
+    server = create_server(port=0, cache=cache)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def stop(server):
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_then_not_modified(server_basepath, client_dir, statuses):
+    cache = WallpaperCache(server_basepath)
+    server, url = serve(cache)
+    try:
+        first = main.fetch_wallpaper(url, client_dir)
+        second = main.fetch_wallpaper(url, client_dir)
+    finally:
+        stop(server)
+
+    assert statuses == [200, 304]
+    assert first == second
+    assert os.path.dirname(first) == client_dir
+    with open(first, 'rb') as f:
+        assert f.read() == cache.wallpaper[0]
+    # Rendered from the server's directory, not the client's main.basepath
+    assert os.path.exists(os.path.join(server_basepath, 'bgs', 'birthday_rendered.bmp'))
+    assert not os.path.exists(os.path.join(client_dir, 'birthday_rendered.bmp'))
+
+
+class CorruptCache:
+    def get(self):
+        return b'not the wallpaper', '"etag"', '0' * 64, 'image/png'
+
+
+def test_checksum_mismatch_keeps_last_download(server_basepath, client_dir):
+    server, url = serve(WallpaperCache(server_basepath))
+    try:
+        path = main.fetch_wallpaper(url, client_dir)
+    finally:
+        stop(server)
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    server, url = serve(CorruptCache())
+    try:
+        assert main.fetch_wallpaper(url, client_dir) == path
+    finally:
+        stop(server)
+    with open(path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_checksum_mismatch_without_download(client_dir):
+    server, url = serve(CorruptCache())
+    try:
+        assert main.fetch_wallpaper(url, client_dir) is None
+    finally:
+        stop(server)
+    assert os.listdir(client_dir) == []
+
+
+def test_server_down_uses_last_download(server_basepath, client_dir, monkeypatch):
+    server, url = serve(WallpaperCache(server_basepath))
+    try:
+        path = main.fetch_wallpaper(url, client_dir)
+    finally:
+        stop(server)
+
+    monkeypatch.setattr(main, 'SERVER_TIMEOUT', 1)
+    assert main.fetch_wallpaper(url, client_dir) == path
+
+
+def test_unknown_path_is_404(server_basepath):
+    server, url = serve(WallpaperCache(server_basepath))
+    try:
+        with pytest.raises(HTTPError) as error:
+            urlopen(url + '/other', timeout=5)
+    finally:
+        stop(server)
+    assert error.value.code == 404
+
+
+@pytest.mark.parametrize('serve_format, signature', [('png', b'\x89PNG'), ('jpeg', b'\xff\xd8')])
+def test_wallpaper_is_reencoded(server_basepath, serve_format, signature):
+    cache = WallpaperCache(server_basepath, serve_format)
+    data, _, _, content_type = cache.get()
+
+    assert content_type == f'image/{serve_format}'
+    assert data.startswith(signature)
+    rendered_path = os.path.join(server_basepath, 'bgs', 'birthday_rendered.bmp')
+    assert len(data) < os.path.getsize(rendered_path)
+    if serve_format == 'png':
+        with Image.open(rendered_path) as rendered, Image.open(BytesIO(data)) as served:
+            assert served.tobytes() == rendered.convert('RGB').tobytes()
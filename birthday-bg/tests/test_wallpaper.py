@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+import main
+import wallpaper
+from benchmark import make_test_basepath
+from wallpaper import (FileWallpaperBackend, WindowsWallpaperBackend, get_wallpaper_backend,
+                       load_wallpaper_state, save_wallpaper_state)
+
+
+def test_state_round_trip(tmp_path):
+    state_path = str(tmp_path / 'wallpaper_state.json')
+    state = {'date': '2026-10-19', 'inputs': [[1, 2.5]], 'extra_paths': [],
+             'backend': 'file', 'path': 'bgs/rendered.bmp', 'hash': 'abc'}
+
+    assert save_wallpaper_state(state_path, state)
+    assert load_wallpaper_state(state_path) == state
+    assert not os.path.exists(state_path + '.tmp')
+
+
+def test_state_missing_or_invalid(tmp_path):
+    state_path = tmp_path / 'wallpaper_state.json'
+    assert load_wallpaper_state(str(state_path)) == {}
+    state_path.write_text('not json', encoding='utf-8')
+    assert load_wallpaper_state(str(state_path)) == {}
+    state_path.write_text('[1, 2]', encoding='utf-8')
+    assert load_wallpaper_state(str(state_path)) == {}
+
+
+@pytest.mark.parametrize('name, backend_class', [
+    ('file', FileWallpaperBackend), ('windows', WindowsWallpaperBackend),
+])
+def test_backend_from_environment(monkeypatch, name, backend_class):
+    monkeypatch.setenv(wallpaper.BACKEND_ENV, name)
+    assert isinstance(get_wallpaper_backend(), backend_class)
+
+
+def test_backend_default_by_platform(monkeypatch):
+    monkeypatch.delenv(wallpaper.BACKEND_ENV, raising=False)
+    monkeypatch.setattr(wallpaper.sys, 'platform', 'linux')
+    assert isinstance(get_wallpaper_backend(), FileWallpaperBackend)
+    monkeypatch.setattr(wallpaper.sys, 'platform', 'win32')
+    assert isinstance(get_wallpaper_backend(), WindowsWallpaperBackend)
+
+
+def test_unknown_backend(monkeypatch):
+    monkeypatch.setenv(wallpaper.BACKEND_ENV, 'gnome')
+    with pytest.raises(ValueError):
+        get_wallpaper_backend()
+
+
+def test_file_backend_copies_to_target(tmp_path):
+    image_path = tmp_path / 'rendered.bmp'
+    image_path.write_bytes(b'BM wallpaper')
+    target_path = tmp_path / 'desktop' / 'wallpaper.bmp'
+
+    backend = FileWallpaperBackend(str(target_path))
+    assert backend.set_wallpaper(str(image_path))
+    assert target_path.read_bytes() == b'BM wallpaper'
+    assert backend.applied_path == str(image_path)
+    assert not backend.set_wallpaper(str(tmp_path / 'missing.bmp'))
+
+
+@pytest.fixture
+def wallpaper_basepath(tmp_path, monkeypatch):
+    basepath = tmp_path / 'birthday-bg'
+    (basepath / 'bgs').mkdir(parents=True)
+    make_test_basepath(str(basepath))
+    monkeypatch.setattr(main, 'basepath', str(basepath))
+    monkeypatch.setenv(wallpaper.BACKEND_ENV, 'file')
+    monkeypatch.setenv(wallpaper.TARGET_ENV, str(tmp_path / 'wallpaper.bmp'))
+    return basepath
+
+
+def run_main():
+    with pytest.raises(SystemExit) as exit_info:
+        main.main()
+    return exit_info.value.code
+
+
+def fail(*args, **kwargs):
+    raise AssertionError("should have been skipped")
+
+
+def test_main_skips_when_unchanged(wallpaper_basepath, tmp_path, monkeypatch):
+    assert run_main() == 0
+    state = load_wallpaper_state(str(wallpaper_basepath / 'bgs' / 'wallpaper_state.json'))
+    assert state['backend'] == 'file'
+    assert os.path.exists(state['path'])
+    assert (tmp_path / 'wallpaper.bmp').exists()
+
+    # Same day and inputs: exits before rendering or touching the wallpaper
+    monkeypatch.setattr(main, 'prepare_wallpaper', fail)
+    monkeypatch.setattr(main, 'set_wallpaper', fail)
+    assert run_main() == 0
+
+
+def test_main_skips_setting_identical_wallpaper(wallpaper_basepath, monkeypatch):
+    assert run_main() == 0
+    state_path = str(wallpaper_basepath / 'bgs' / 'wallpaper_state.json')
+    state = load_wallpaper_state(state_path)
+
+    # A new day renders again, but the same image isn't applied again
+    save_wallpaper_state(state_path, dict(state, date='2000-01-01'))
+    monkeypatch.setattr(main, 'set_wallpaper', fail)
+    assert run_main() == 0
+    assert load_wallpaper_state(state_path)['date'] == state['date']
@@ -0,0 +1,118 @@
+"""
+Wallpaper backends and the persisted state of the last applied wallpaper
+"""
+
+import json
+import os
+import shutil
+import sys
+
+# Environment variable to force a backend (e.g. "file" on Linux/CI)
+BACKEND_ENV = "BIRTHDAY_BG_WALLPAPER_BACKEND"
+# Target file for the file backend
+TARGET_ENV = "BIRTHDAY_BG_WALLPAPER_TARGET"
+
+
+class WallpaperBackend:
+    """Base class for wallpaper backends"""
+    name = "base"
+
+    def set_wallpaper(self, image_path):
+        """Set desktop wallpaper, return True on success"""
+        raise NotImplementedError
+
+
+class WindowsWallpaperBackend(WallpaperBackend):
+    """Set wallpaper using Windows API"""
+    name = "windows"
+
+    SPI_SETDESKWALLPAPER = 20
+    SPIF_UPDATEINIFILE = 0x01
+    SPIF_SENDCHANGE = 0x02
+
+    def set_wallpaper(self, image_path):
+        try:
+            import ctypes
+
+            # Convert to absolute path
+            abs_path = os.path.abspath(image_path)
+
+            result = ctypes.windll.user32.SystemParametersInfoW(
+                self.SPI_SETDESKWALLPAPER,
+                0,
+                abs_path,
+                self.SPIF_UPDATEINIFILE | self.SPIF_SENDCHANGE
+            )
+
+            return result != 0
+
+        except Exception as e:
+            print(f"Error setting wallpaper: {e}")
+            return False
+
+
+class FileWallpaperBackend(WallpaperBackend):
+    """Stand-in backend for Linux/CI: copy the wallpaper to a target file
+
+    Without a target path (argument or BIRTHDAY_BG_WALLPAPER_TARGET) it only
+    records the applied path (no-op).
+    """
+    name = "file"
+
+    def __init__(self, target_path=None):
+        self.target_path = target_path or os.environ.get(TARGET_ENV)
+        self.applied_path = None
+
+    def set_wallpaper(self, image_path):
+        try:
+            if not os.path.exists(image_path):
+                return False
+            if self.target_path:
+                target_dir = os.path.dirname(self.target_path)
+                if target_dir:
+                    os.makedirs(target_dir, exist_ok=True)
+                shutil.copyfile(image_path, self.target_path)
+            self.applied_path = os.path.abspath(image_path)
+            return True
+        except Exception as e:
+            print(f"Error setting wallpaper: {e}")
+            return False
+
+
+WALLPAPER_BACKENDS = {
+    WindowsWallpaperBackend.name: WindowsWallpaperBackend,
+    FileWallpaperBackend.name: FileWallpaperBackend,
+}
+
+
+def get_wallpaper_backend(name=None, **kwargs):
+    """Get a wallpaper backend by name, defaulting by platform"""
+    if name is None:
+        name = os.environ.get(BACKEND_ENV)
+    if not name:
+        name = "windows" if sys.platform == "win32" else "file"
+    if name not in WALLPAPER_BACKENDS:
+        raise ValueError(f"Unknown wallpaper backend: {name}")
+    return WALLPAPER_BACKENDS[name](**kwargs)
+
+
+def load_wallpaper_state(state_path):
+    """Load state of the last applied wallpaper, empty dict if missing"""
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_wallpaper_state(state_path, state):
+    """Save state of the last applied wallpaper"""
+    try:
+        with open(state_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(state_path + ".tmp", state_path)
+        return True
+    except Exception as e:
+        print(f"Error saving wallpaper state {state_path}: {e}")
+        return False
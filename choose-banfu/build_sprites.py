@@ -0,0 +1,169 @@
+"""
+Pre-render every garment preview of selector.html into one sprite sheet
+
+Usage: python build_sprites.py [output directory]
+
+Writes sprites.<hash>.jpg and sprites.json (offsets by "type-closure-color",
+the same keys selector.html submits) for monitor.html. Run by the Pages
+workflow before upload; the garment photos are downloaded from the same
+URLs selector.html uses.
+"""
+
+import hashlib
+import json
+import math
+import os
+import sys
+from io import BytesIO
+from urllib.request import Request, urlopen
+from PIL import Image, ImageDraw
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Options and photos, as in selector.html
+CLOTHING_URLS = {
+    '外套': 'https://pic.pngsucai.com/00/27/73/dca0bc29182c0f9a.webp',
+    '卫衣': 'https://img.alicdn.com/bao/uploaded/i4/377819308/O1CN01iUhl1g2Id7EqoXoOU_!!377819308.jpg',
+    '棒球服': 'https://ts1.tc.mm.bing.net/th/id/OIP-C.blUCY1HunVK_iZydA_iwpAAAAA',
+}
+CLOSURES = ['拉链', '纽扣', '无']
+# Color name: ('grayscale', amount) or ('hue', degrees)
+COLORS = {
+    '黑白': ('grayscale', 1),
+    '蓝白': ('hue', 0),
+    '绿白': ('hue', 268),
+    '红白': ('hue', 125),
+}
+LOGO_PATH = os.path.join(HERE, '9bc6c230aae52903eb94d8ed4c078957.jpg')
+
+# .clothes-image max-width/max-height: overlays are drawn at this size, in CSS px
+PREVIEW_SIZE = (300, 400)
+# Size of one sprite, previews are scaled to fit and centered on white
+CELL_SIZE = (150, 200)
+# Sprites per row of the sheet: one row per type and closure, one column per color
+COLUMNS = len(COLORS)
+JPEG_QUALITY = 85
+DOWNLOAD_TIMEOUT = 30
+
+
+def download_image(url):
+    """Download an image, as RGB"""
+    request = Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    with urlopen(request, timeout=DOWNLOAD_TIMEOUT) as response:
+        data = response.read()
+    return Image.open(BytesIO(data)).convert('RGB')
+
+
+def grayscale_matrix(amount):
+    """RGB matrix of the CSS grayscale() filter"""
+    a = 1 - amount
+    return (
+        0.2126 + 0.7874 * a, 0.7152 - 0.7152 * a, 0.0722 - 0.0722 * a, 0,
+        0.2126 - 0.2126 * a, 0.7152 + 0.2848 * a, 0.0722 - 0.0722 * a, 0,
+        0.2126 - 0.2126 * a, 0.7152 - 0.7152 * a, 0.0722 + 0.9278 * a, 0,
+    )
+
+
+def hue_rotate_matrix(degrees):
+    """RGB matrix of the CSS hue-rotate() filter"""
+    c = math.cos(math.radians(degrees))
+    s = math.sin(math.radians(degrees))
+    return (
+        0.213 + c * 0.787 - s * 0.213, 0.715 - c * 0.715 - s * 0.715, 0.072 - c * 0.072 + s * 0.928, 0,
+        0.213 - c * 0.213 + s * 0.143, 0.715 + c * 0.285 + s * 0.140, 0.072 - c * 0.072 - s * 0.283, 0,
+        0.213 - c * 0.213 - s * 0.787, 0.715 - c * 0.715 + s * 0.715, 0.072 + c * 0.928 + s * 0.072, 0,
+    )
+
+
+def apply_color(image, color):
+    """Apply a color option's CSS filter to the garment photo"""
+    kind, value = COLORS[color]
+    matrix = grayscale_matrix(value) if kind == 'grayscale' else hue_rotate_matrix(value)
+    return image.convert('RGB', matrix)
+
+
+def fit_size(size, box):
+    """Scale size down to fit box, keeping the aspect ratio (never up)"""
+    scale = min(box[0] / size[0], box[1] / size[1], 1.0)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def draw_overlay(image, closure, logo):
+    """Draw the closure and logo overlays of selector.html onto image, in place"""
+    width, height = image.size
+    draw = ImageDraw.Draw(image)
+    if closure == '拉链':
+        # .zipper: 4px wide, 80% high from 10%, centered
+        x = width / 2 - 2
+        draw.rectangle((x, height * 0.1, x + 3, height * 0.9 - 1), fill='#666666')
+    elif closure == '纽扣':
+        # .buttons at 20%: four 12px dots, 15px apart
+        y = height * 0.2 + 15
+        for _ in range(4):
+            draw.ellipse((width / 2 - 6, y, width / 2 + 5, y + 11), fill='#333333')
+            y += 12 + 15
+
+    # .logo: 30% wide box at 38% from the top, background-size: contain
+    scale = min(width * 0.3 / logo.width, height / logo.height)
+    logo_size = (max(1, round(logo.width * scale)), max(1, round(logo.height * scale)))
+    image.paste(logo.resize(logo_size, Image.Resampling.LANCZOS),
+                (round(width * 0.35), round(height * 0.38)))
+
+
+def render_preview(photo, closure, color, logo):
+    """Render one option combination as selector.html shows it, fitted into CELL_SIZE"""
+    preview = apply_color(photo.resize(fit_size(photo.size, PREVIEW_SIZE), Image.Resampling.LANCZOS), color)
+    draw_overlay(preview, closure, logo)
+    return preview.resize(fit_size(preview.size, CELL_SIZE), Image.Resampling.LANCZOS)
+
+
+def build_sprite_sheet(photos, logo):
+    """Render every combination into one sheet, return (sheet, {key: [x, y]})"""
+    keys = [(clothing, closure, color)
+            for clothing in CLOTHING_URLS for closure in CLOSURES for color in COLORS]
+    rows = math.ceil(len(keys) / COLUMNS)
+    sheet = Image.new('RGB', (CELL_SIZE[0] * COLUMNS, CELL_SIZE[1] * rows), 'white')
+    offsets = {}
+    for i, (clothing, closure, color) in enumerate(keys):
+        sprite = render_preview(photos[clothing], closure, color, logo)
+        x = (i % COLUMNS) * CELL_SIZE[0]
+        y = (i // COLUMNS) * CELL_SIZE[1]
+        # Center the sprite in its cell
+        sheet.paste(sprite, (x + (CELL_SIZE[0] - sprite.width) // 2,
+                             y + (CELL_SIZE[1] - sprite.height) // 2))
+        offsets[f"{clothing}-{closure}-{color}"] = [x, y]
+    return sheet, offsets
+
+
+def save_sprite_sheet(sheet, offsets, output_dir):
+    """Write the sheet under a content-hashed name plus the JSON index, return the index"""
+    buffer = BytesIO()
+    sheet.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    data = buffer.getvalue()
+    image_name = f"sprites.{hashlib.sha256(data).hexdigest()[:12]}.jpg"
+    with open(os.path.join(output_dir, image_name), 'wb') as f:
+        f.write(data)
+
+    index = {
+        'image': image_name,
+        'size': list(sheet.size),
+        'cell': list(CELL_SIZE),
+        'sprites': offsets,
+    }
+    with open(os.path.join(output_dir, 'sprites.json'), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    return index
+
+
+def main(output_dir=HERE):
+    photos = {clothing: download_image(url) for clothing, url in CLOTHING_URLS.items()}
+    logo = Image.open(LOGO_PATH).convert('RGB')
+    sheet, offsets = build_sprite_sheet(photos, logo)
+    index = save_sprite_sheet(sheet, offsets, output_dir)
+    size_kb = os.path.getsize(os.path.join(output_dir, index['image'])) / 1024
+    print(f"Wrote {index['image']} ({len(offsets)} sprites, {sheet.size[0]}x{sheet.size[1]}, "
+          f"{size_kb:.0f} KB) and sprites.json")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])